@@ -0,0 +1,98 @@
+"""LLM 输出中的 JSON 对象抽取（characters / conflict / content 共用）"""
+import json
+import re
+from typing import Any, AsyncIterator
+
+import orjson
+
+_DECODER = json.JSONDecoder()
+_FENCE_LANG_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-"
+# raw_decode 失败时的兜底：首个 { 到最后一个 }
+_JSON_OBJECT_SPAN = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def strip_fence(raw: str) -> str:
+    text = str(raw or "").strip()
+    if text.startswith("```"):
+        text = text[3:]
+        # 字母数字串独占一行（后跟换行或到结尾）才算语言标记；否则只按旧规则去掉紧跟的 json，
+        # 避免 "```Overall ..." 或 "```json7.5" 这类正文被吃掉
+        tag_end = len(text) - len(text.lstrip(_FENCE_LANG_CHARS))
+        if text[tag_end:tag_end + 1] in ("", "\n", "\r"):
+            text = text[tag_end:]
+        elif text.startswith("json"):
+            text = text[4:]
+        text = text.lstrip()
+        if text.endswith("```"):
+            text = text[:-3].rstrip()
+    return text.strip()
+
+
+def decode_first_object(raw: str, max_attempts: int = 16) -> dict | None:
+    """从 LLM 回复中解析第一个 JSON 对象；首个 { 解析失败则尝试下一个 {，最多 max_attempts 次，找不到返回 None。"""
+    text = strip_fence(raw)
+    first = text.find("{")
+    if first < 0:
+        return None
+    if first == 0 and text.endswith("}"):
+        # 常见情况：整段就是一个对象，直接走 orjson
+        try:
+            parsed = orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+        else:
+            return parsed if isinstance(parsed, dict) else None
+    start = first
+    attempts = 0
+    while start >= 0 and attempts < max_attempts:
+        try:
+            parsed, _ = _DECODER.raw_decode(text, start)
+        except ValueError:
+            pass
+        else:
+            if isinstance(parsed, dict):
+                return parsed
+        start = text.find("{", start + 1)
+        attempts += 1
+    match = _JSON_OBJECT_SPAN.search(text, first)
+    if not match:
+        return None
+    try:
+        parsed = json.loads(match.group(0))
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+async def read_until_first_object(chunks: AsyncIterator[str]) -> str:
+    """消费流式增量，首个 JSON 对象闭合后立即停止读取，返回已累计文本。"""
+    buf = ""
+    start = -1
+    try:
+        async for chunk in chunks:
+            if start < 0:
+                pos = chunk.find("{")
+                if pos >= 0:
+                    start = len(buf) + pos
+            buf += chunk
+            # 只有出现 } 时对象才可能闭合；这里只从首个 { 做一次 raw_decode，
+            # orjson 与正则兜底留给最终的 decode_first_object
+            if start >= 0 and "}" in chunk:
+                try:
+                    _DECODER.raw_decode(buf, start)
+                except ValueError:
+                    continue
+                break
+    finally:
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    return buf
+
+
+async def chat_until_json_object(llm: Any, **chat_kwargs) -> str:
+    """优先走流式接口：JSON 对象闭合后即停止读取，不再等模型输出收尾文本；无流式接口时退回 chat。"""
+    chat_stream = getattr(llm, "chat_stream", None)
+    if chat_stream is None:
+        return await llm.chat(**chat_kwargs)
+    return await read_until_first_object(await chat_stream(**chat_kwargs))
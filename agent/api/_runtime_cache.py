@@ -0,0 +1,57 @@
+"""按项目缓存的运行时配置（模型名/温度等），带 TTL，项目或 Agent 配置变更时主动失效"""
+import threading
+import time
+from collections.abc import Hashable
+from typing import Any
+
+
+class TTLCache:
+    """线程安全的小型 TTL 缓存；超出容量时淘汰最早写入的条目。"""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: dict[Hashable, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data.pop(key, None)
+            if len(self._data) >= self.maxsize:
+                del self._data[next(iter(self._data))]
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate_project(self, project_id: str):
+        with self._lock:
+            stale = [
+                k for k in self._data
+                if k == project_id or (isinstance(k, tuple) and k and k[0] == project_id)
+            ]
+            for k in stale:
+                del self._data[k]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_registry: list[TTLCache] = []
+
+
+def invalidate_project(project_id: str):
+    """项目设置或 Agent 配置被修改后调用，清掉所有以该项目为键的缓存。"""
+    for cache in _registry:
+        cache.invalidate_project(project_id)
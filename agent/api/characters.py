@@ -1,19 +1,31 @@
 """角色 CRUD API"""
-import json
+import asyncio
 import logging
 import re
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import Any, Optional
 from agents import router as agent_router
+from api._json_scan import chat_until_json_object, decode_first_object
 from db import get_db
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# 年龄清洗：删除全部 Unicode 空白（与正则 \s 一致，最大码位为 U+3000），并把全角数字折叠为 ASCII，后续正则只需匹配 [0-9]
+_AGE_TRANSLATE = {
+    **dict.fromkeys(i for i in range(0x3001) if chr(i).isspace()),
+    **str.maketrans("０１２３４５６７８９", "0123456789"),
+}
+_RE_AGE_FULL = re.compile(r"\d{1,3}", re.ASCII)
+_RE_AGE_RANGE = re.compile(r"(\d{1,3})[~\-～到](\d{1,3})(?:岁)?", re.ASCII)
+_RE_AGE_FIND = re.compile(r"(\d{1,3})", re.ASCII)
+_CATEGORY_VALUES = {"主角", "反派", "配角", "其他"}
+_GENDER_VALUES = {"男", "女", "非二元"}
+
 
 def _clip(text: str, limit: int) -> str:
-    s = str(text or "").strip()
+    s = text.strip() if isinstance(text, str) else str(text or "").strip()
     return s if len(s) <= limit else s[:limit]
 
 
@@ -39,7 +51,7 @@ def _normalize_gender_value(raw: str) -> str:
 
 def _normalize_category_value(raw: str) -> str:
     v = str(raw or "").strip()
-    if v in {"主角", "反派", "配角", "其他"}:
+    if v in _CATEGORY_VALUES:
         return v
     if "主" in v:
         return "主角"
@@ -51,7 +63,7 @@ def _normalize_category_value(raw: str) -> str:
 
 
 def _normalize_age_value(raw: str) -> str:
-    v = re.sub(r"\s+", "", str(raw or "").strip())
+    v = str(raw or "").translate(_AGE_TRANSLATE)
     if not v:
         return "18"
     lowered = v.lower()
@@ -59,14 +71,14 @@ def _normalize_age_value(raw: str) -> str:
         k in lowered for k in ("unknown", "unspecified", "notspecified", "n/a", "na")
     ):
         return "18"
-    if re.fullmatch(r"\d{1,3}", v):
+    if _RE_AGE_FULL.fullmatch(v):
         try:
             parsed = int(v)
             if 0 < parsed < 160:
                 return str(parsed)
         except Exception:
             pass
-    range_match = re.fullmatch(r"(\d{1,3})[~\-～到](\d{1,3})(?:岁)?", v)
+    range_match = _RE_AGE_RANGE.fullmatch(v)
     if range_match:
         try:
             left = int(range_match.group(1))
@@ -75,7 +87,7 @@ def _normalize_age_value(raw: str) -> str:
                 return str(int(round((left + right) / 2)))
         except Exception:
             pass
-    m = re.search(r"(\d{1,3})", v)
+    m = _RE_AGE_FIND.search(v)
     if m:
         try:
             parsed = int(m.group(1))
@@ -86,8 +98,26 @@ def _normalize_age_value(raw: str) -> str:
     return "18"
 
 
+def _is_canonical_age(age: Any) -> bool:
+    return (
+        isinstance(age, str)
+        and 0 < len(age) <= 3
+        and age.isascii()
+        and age.isdigit()
+        and age[0] != "0"
+        and int(age) < 160
+    )
+
+
 def _normalize_character_row(row: dict) -> dict:
     data = dict(row)
+    # 绝大多数已入库行本身就是规范值，直接返回
+    if (
+        data.get("category") in _CATEGORY_VALUES
+        and data.get("gender") in _GENDER_VALUES
+        and _is_canonical_age(data.get("age"))
+    ):
+        return data
     data["category"] = _normalize_category_value(str(data.get("category") or ""))
     data["gender"] = _normalize_gender_value(str(data.get("gender") or ""))
     data["age"] = _normalize_age_value(str(data.get("age") or ""))
@@ -95,86 +125,68 @@ def _normalize_character_row(row: dict) -> dict:
 
 
 def _normalize_name_key(name: str) -> str:
-    return re.sub(r"\s+", "", str(name or "").strip()).lower()
+    return "".join(str(name or "").split()).lower()
 
 
 def _ensure_unique_character_name(raw_name: str, existing_names: set[str]) -> str:
-    base = _clip(str(raw_name or "").strip(), 30) or "新角色"
-    if _normalize_name_key(base) not in existing_names:
+    base = _clip(raw_name, 30) or "新角色"
+    base_key = _normalize_name_key(base)
+    if base_key not in existing_names:
         return base
     for idx in range(2, 200):
-        candidate = _clip(f"{base}{idx}", 30)
+        suffix = str(idx)
+        if len(base) + len(suffix) <= 30:
+            # 数字后缀不含空白，候选 key 可直接由 base_key 拼出
+            if f"{base_key}{suffix}" not in existing_names:
+                return f"{base}{suffix}"
+            continue
+        candidate = _clip(f"{base}{suffix}", 30)
         if _normalize_name_key(candidate) not in existing_names:
             return candidate
     return _clip(f"{base}{len(existing_names) + 1}", 30)
 
 
-def _strip_fence(raw: str) -> str:
-    text = str(raw or "").strip()
-    if text.startswith("```"):
-        text = re.sub(r"^```[a-zA-Z0-9_-]*\s*", "", text)
-        text = re.sub(r"\s*```$", "", text)
-    return text.strip()
-
-
-def _extract_json_object(raw: str) -> str:
-    text = _strip_fence(raw)
-    if not text:
-        return ""
-    if text.startswith("{") and text.endswith("}"):
-        return text
-    start = text.find("{")
-    if start < 0:
-        return ""
-    depth = 0
-    for idx in range(start, len(text)):
-        ch = text[idx]
-        if ch == "{":
-            depth += 1
-        elif ch == "}":
-            depth -= 1
-            if depth == 0:
-                return text[start : idx + 1]
-    return ""
+_AI_CHARACTER_NESTED_KEYS = ("character", "profile", "角色", "角色档案", "人物", "data")
+_AI_CHARACTER_TEXT_FIELDS = (
+    ("identity", ("identity", "身份", "职业"), 120),
+    ("appearance", ("appearance", "外貌", "外形"), 600),
+    ("personality", ("personality", "性格"), 600),
+    ("motivation", ("motivation", "动机", "目标"), 300),
+    ("backstory", ("backstory", "背景", "经历"), 600),
+    ("arc", ("arc", "弧线", "成长弧线"), 300),
+    ("usage_notes", ("usage_notes", "usage_advice", "使用建议"), 600),
+)
 
 
 def _pick_str_alias(data: dict[str, Any], keys: tuple[str, ...], default: str = "") -> str:
     for key in keys:
         val = data.get(key)
-        if isinstance(val, str) and val.strip():
-            return val.strip()
+        if val.__class__ is str:
+            val = val.strip()
+            if val:
+                return val
     return default
 
 
 def _parse_ai_character_payload(raw: str) -> dict[str, str]:
-    json_text = _extract_json_object(raw)
-    if not json_text:
-        return {}
-    try:
-        payload = json.loads(json_text)
-    except Exception:
-        return {}
-    if not isinstance(payload, dict):
+    payload = decode_first_object(raw)
+    if not payload:
         return {}
     merged: dict[str, Any] = {}
-    for key in ("character", "profile", "角色", "角色档案", "人物", "data"):
+    for key in _AI_CHARACTER_NESTED_KEYS:
         nested = payload.get(key)
         if isinstance(nested, dict):
             merged.update(nested)
     merged.update(payload)
-    return {
-        "name": _clip(_pick_str_alias(merged, ("name", "character_name", "姓名", "角色名"), ""), 30),
+    result = {
+        "name": _clip(_pick_str_alias(merged, ("name", "character_name", "姓名", "角色名")), 30),
         "category": _normalize_category_value(_pick_str_alias(merged, ("category", "role", "角色定位", "角色类型"), "配角")),
         "gender": _normalize_gender_value(_pick_str_alias(merged, ("gender", "sex", "性别"), "男")),
         "age": _normalize_age_value(_pick_str_alias(merged, ("age", "年龄"), "18")),
-        "identity": _clip(_pick_str_alias(merged, ("identity", "身份", "职业"), ""), 120),
-        "appearance": _clip(_pick_str_alias(merged, ("appearance", "外貌", "外形"), ""), 600),
-        "personality": _clip(_pick_str_alias(merged, ("personality", "性格"), ""), 600),
-        "motivation": _clip(_pick_str_alias(merged, ("motivation", "动机", "目标"), ""), 300),
-        "backstory": _clip(_pick_str_alias(merged, ("backstory", "背景", "经历"), ""), 600),
-        "arc": _clip(_pick_str_alias(merged, ("arc", "弧线", "成长弧线"), ""), 300),
-        "usage_notes": _clip(_pick_str_alias(merged, ("usage_notes", "usage_advice", "使用建议"), ""), 600),
     }
+    for field, keys, limit in _AI_CHARACTER_TEXT_FIELDS:
+        result[field] = _clip(_pick_str_alias(merged, keys), limit)
+    return result
 
 
 class CharacterCreate(BaseModel):
@@ -249,18 +261,12 @@ def create_character(req: CharacterCreate):
         return _normalize_character_row(dict(row))
 
 
-@router.post("/ai-generate")
-async def generate_single_character(req: CharacterAIGenerateRequest):
-    agent_router._init_services()
-    llm = agent_router._llm
-    if llm is None:
-        raise HTTPException(500, "模型服务未初始化")
-
+def _gather_generation_context(project_id: str) -> dict[str, Any]:
     with get_db() as db:
         project = db.execute(
             "SELECT id, name, genre, description, structure, custom_structure, word_target, model_main, temperature "
             "FROM projects WHERE id = ?",
-            (req.project_id,),
+            (project_id,),
         ).fetchone()
         if not project:
             raise HTTPException(404, "项目不存在")
@@ -268,60 +274,82 @@ async def generate_single_character(req: CharacterAIGenerateRequest):
         existing_rows = db.execute(
             "SELECT name, category, gender, age, identity, personality, motivation "
             "FROM characters WHERE project_id = ? ORDER BY sort_order ASC, created_at ASC LIMIT 24",
-            (req.project_id,),
+            (project_id,),
         ).fetchall()
         outline_rows = db.execute(
             "SELECT phase, title, content FROM outlines WHERE project_id = ? ORDER BY phase_order ASC, created_at ASC LIMIT 8",
-            (req.project_id,),
+            (project_id,),
         ).fetchall()
         world_rows = db.execute(
             "SELECT category, title, content FROM worldbuilding WHERE project_id = ? "
             "ORDER BY category ASC, sort_order ASC, created_at ASC LIMIT 8",
-            (req.project_id,),
+            (project_id,),
         ).fetchall()
         latest_bible = None
         try:
             latest_bible = db.execute(
                 "SELECT version, content FROM story_bibles WHERE project_id = ? ORDER BY version DESC LIMIT 1",
-                (req.project_id,),
+                (project_id,),
             ).fetchone()
         except Exception:
             latest_bible = None
+    return {
+        "project": project,
+        "existing_rows": existing_rows,
+        "outline_rows": outline_rows,
+        "world_rows": world_rows,
+        "latest_bible": latest_bible,
+    }
 
-    existing_names = [str(r["name"] or "").strip() for r in existing_rows if str(r["name"] or "").strip()]
-    existing_name_keys = {_normalize_name_key(name) for name in existing_names}
+
+@router.post("/ai-generate")
+async def generate_single_character(req: CharacterAIGenerateRequest):
+    agent_router._init_services()
+    llm = agent_router._llm
+    if llm is None:
+        raise HTTPException(500, "模型服务未初始化")
+
+    ctx = await asyncio.to_thread(_gather_generation_context, req.project_id)
+    project = ctx["project"]
+    existing_rows = ctx["existing_rows"]
+    outline_rows = ctx["outline_rows"]
+    world_rows = ctx["world_rows"]
+    latest_bible = ctx["latest_bible"]
+
+    existing_names: list[str] = []
+    existing_name_keys: set[str] = set()
+    for r in existing_rows:
+        existing_name = (r["name"] or "").strip()
+        if not existing_name:
+            continue
+        existing_names.append(existing_name)
+        existing_name_keys.add(_normalize_name_key(existing_name))
     existing_name_hint = "、".join(existing_names[:20]) if existing_names else "无"
 
     character_context_lines: list[str] = []
     for row in existing_rows[:10]:
-        name = _clip(str(row["name"] or "").strip(), 20)
+        name = _clip(row["name"], 20)
         if not name:
             continue
-        category = _normalize_category_value(str(row["category"] or ""))
-        gender = _normalize_gender_value(str(row["gender"] or ""))
-        age = _normalize_age_value(str(row["age"] or ""))
-        identity = _clip(str(row["identity"] or "").strip(), 60)
-        personality = _clip(str(row["personality"] or "").strip(), 60)
-        motivation = _clip(str(row["motivation"] or "").strip(), 60)
-        detail = identity or personality or motivation
+        category = _normalize_category_value(row["category"])
+        gender = _normalize_gender_value(row["gender"])
+        age = _normalize_age_value(row["age"])
+        detail = _clip(row["identity"], 60) or _clip(row["personality"], 60) or _clip(row["motivation"], 60)
         character_context_lines.append(f"- {name}({category}/{gender}/{age})：{detail}")
     characters_block = "\n".join(character_context_lines) if character_context_lines else "- 暂无已有角色"
 
     outline_context_lines: list[str] = []
     for row in outline_rows[:6]:
-        phase = _clip(str(row["phase"] or "").strip(), 8)
-        title = _clip(str(row["title"] or "").strip(), 32)
-        content = _clip(str(row["content"] or "").strip(), 90)
+        phase = _clip(row["phase"], 8)
         phase_tag = f"[{phase}] " if phase else ""
-        outline_context_lines.append(f"- {phase_tag}{title}：{content}")
+        outline_context_lines.append(f"- {phase_tag}{_clip(row['title'], 32)}：{_clip(row['content'], 90)}")
     outlines_block = "\n".join(outline_context_lines) if outline_context_lines else "- 暂无大纲"
 
     world_context_lines: list[str] = []
     for row in world_rows[:6]:
-        category = _clip(str(row["category"] or "").strip(), 16)
-        title = _clip(str(row["title"] or "").strip(), 32)
-        content = _clip(str(row["content"] or "").strip(), 90)
-        world_context_lines.append(f"- {title}({category})：{content}")
+        world_context_lines.append(
+            f"- {_clip(row['title'], 32)}({_clip(row['category'], 16)})：{_clip(row['content'], 90)}"
+        )
     world_block = "\n".join(world_context_lines) if world_context_lines else "- 暂无世界观"
 
     bible_text = ""
@@ -370,7 +398,8 @@ async def generate_single_character(req: CharacterAIGenerateRequest):
 
     raw = ""
     try:
-        raw = await llm.chat(
+        raw = await chat_until_json_object(
+            llm,
             model=model_name,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -383,7 +412,8 @@ async def generate_single_character(req: CharacterAIGenerateRequest):
         fallback_model = "claude-sonnet-4"
         if model_name != fallback_model:
             try:
-                raw = await llm.chat(
+                raw = await chat_until_json_object(
+                    llm,
                     model=fallback_model,
                     messages=[
                         {"role": "system", "content": system_prompt},
@@ -404,8 +434,8 @@ async def generate_single_character(req: CharacterAIGenerateRequest):
 
     name = _ensure_unique_character_name(payload.get("name", ""), existing_name_keys)
     category = _normalize_category_value(payload.get("category", category_hint))
-    if category not in {"主角", "反派", "配角", "其他"}:
-        category = category_hint if category_hint in {"主角", "反派", "配角", "其他"} else "配角"
+    if category not in _CATEGORY_VALUES:
+        category = category_hint if category_hint in _CATEGORY_VALUES else "配角"
     gender = _normalize_gender_value(payload.get("gender", ""))
     age = _normalize_age_value(payload.get("age", ""))
 
@@ -468,7 +498,12 @@ def get_character(char_id: str):
 @router.put("/{char_id}")
 def update_character(char_id: str, req: CharacterUpdate):
     updates, values = [], []
-    payload = req.model_dump(exclude_none=True)
+    # 只遍历请求里实际出现的字段，避免 model_dump 走完整个字段表
+    payload = {}
+    for field in req.model_fields_set:
+        val = getattr(req, field)
+        if val is not None:
+            payload[field] = val
     if "category" in payload:
         payload["category"] = _normalize_category_value(str(payload.get("category") or ""))
     if "gender" in payload:
@@ -1,5 +1,4 @@
-import json
-import re
+import asyncio
 from typing import List
 
 from fastapi import APIRouter
@@ -8,6 +7,7 @@ from pydantic import BaseModel
 from db import get_db
 from agents import router as agent_router
 from agents.default_prompts import CONFLICT_REVIEW_SYSTEM_PROMPT
+from api._json_scan import decode_first_object
 
 router = APIRouter()
 AGENT_TYPE = "conflict_reviewer"
@@ -15,6 +15,36 @@ DEFAULT_MODEL = "claude-sonnet-4"
 DEFAULT_TEMPERATURE = 0.2
 DEFAULT_MAX_TOKENS = 1500
 
+# SQL 文本保持为模块常量：同一连接内重复执行时可直接命中 sqlite3 语句缓存
+_Q_CONFIG_JOIN = (
+    "SELECT p.model_main, ac.model AS cfg_model, ac.temperature AS cfg_temp, "
+    "ac.system_prompt AS cfg_prompt, ac.enabled AS cfg_enabled, ac.max_tokens AS cfg_max_tokens "
+    "FROM projects p "
+    "LEFT JOIN agent_configs ac "
+    "ON ac.project_id = p.id AND ac.agent_type = ? "
+    "WHERE p.id = ?"
+)
+_Q_BIBLE = (
+    "SELECT version, content FROM story_bibles WHERE project_id = ? "
+    "ORDER BY version DESC LIMIT 1"
+)
+_Q_CHARS = (
+    "SELECT name, category, gender, age, identity, personality, motivation "
+    "FROM characters WHERE project_id = ? ORDER BY created_at ASC LIMIT 40"
+)
+_Q_WORLD = (
+    "SELECT title, category, content FROM worldbuilding "
+    "WHERE project_id = ? ORDER BY created_at ASC LIMIT 40"
+)
+_Q_FORESHADOW = (
+    "SELECT name, description, status FROM foreshadowing "
+    "WHERE project_id = ? ORDER BY created_at ASC LIMIT 40"
+)
+_Q_OUTLINES = (
+    "SELECT phase, title, content FROM outlines "
+    "WHERE project_id = ? ORDER BY phase_order ASC LIMIT 12"
+)
+
 class ConflictRequest(BaseModel):
     project_id: str
     text: str
@@ -31,40 +61,14 @@ class ConflictResponse(BaseModel):
 
 
 def _clip(text: str, limit: int) -> str:
-    s = (text or "").strip()
+    s = text.strip() if isinstance(text, str) else str(text or "").strip()
     if len(s) <= limit:
         return s
     return s[:limit] + "..."
 
 
 def _extract_json(raw: str) -> dict:
-    text = (raw or "").strip()
-    if not text:
-        return {}
-
-    # 先尝试去掉 markdown fence
-    if text.startswith("```"):
-        text = re.sub(r"^```(?:json)?\s*", "", text)
-        text = re.sub(r"\s*```$", "", text)
-
-    try:
-        parsed = json.loads(text)
-        if isinstance(parsed, dict):
-            return parsed
-    except Exception:
-        pass
-
-    # 兜底：抽取第一个 JSON 对象
-    match = re.search(r"\{[\s\S]*\}", text)
-    if not match:
-        return {}
-    try:
-        parsed = json.loads(match.group(0))
-        if isinstance(parsed, dict):
-            return parsed
-    except Exception:
-        return {}
-    return {}
+    return decode_first_object(raw) or {}
 
 
 def _normalize_max_tokens(value, default_value: int) -> int:
@@ -80,12 +84,7 @@ def _normalize_max_tokens(value, default_value: int) -> int:
 def _load_runtime_config(project_id: str) -> tuple[str, float, str, bool, int]:
     with get_db() as db:
         row = db.execute(
-            "SELECT p.model_main, ac.model AS cfg_model, ac.temperature AS cfg_temp, "
-            "ac.system_prompt AS cfg_prompt, ac.enabled AS cfg_enabled, ac.max_tokens AS cfg_max_tokens "
-            "FROM projects p "
-            "LEFT JOIN agent_configs ac "
-            "ON ac.project_id = p.id AND ac.agent_type = ? "
-            "WHERE p.id = ?",
+            _Q_CONFIG_JOIN,
             (AGENT_TYPE, project_id),
         ).fetchone()
         if not row:
@@ -112,8 +111,7 @@ def _load_review_context(project_id: str) -> str:
 
     with get_db() as db:
         bible = db.execute(
-            "SELECT version, content FROM story_bibles WHERE project_id = ? "
-            "ORDER BY version DESC LIMIT 1",
+            _Q_BIBLE,
             (project_id,),
         ).fetchone()
         if bible:
@@ -122,52 +120,48 @@ def _load_review_context(project_id: str) -> str:
             )
 
         chars = db.execute(
-            "SELECT name, category, gender, age, identity, personality, motivation "
-            "FROM characters WHERE project_id = ? ORDER BY created_at ASC LIMIT 40",
+            _Q_CHARS,
             (project_id,),
         ).fetchall()
         if chars:
             rows = []
             for c in chars:
-                tags = [
+                tags = (
                     str(c["category"] or "").strip(),
                     str(c["gender"] or "").strip(),
                     str(c["age"] or "").strip(),
-                ]
-                tags_text = "/".join([t for t in tags if t])
+                )
+                tags_text = "/".join(t for t in tags if t)
                 rows.append(
                     f"- {c['name']}（{tags_text or '未分类'}）"
-                    f" | 身份:{_clip(c['identity'] or '', 80)}"
-                    f" | 性格:{_clip(c['personality'] or '', 60)}"
-                    f" | 动机:{_clip(c['motivation'] or '', 60)}"
+                    f" | 身份:{_clip(c['identity'], 80)}"
+                    f" | 性格:{_clip(c['personality'], 60)}"
+                    f" | 动机:{_clip(c['motivation'], 60)}"
                 )
             chunks.append("【角色设定】\n" + "\n".join(rows) + "\n")
 
         world = db.execute(
-            "SELECT title, category, content FROM worldbuilding "
-            "WHERE project_id = ? ORDER BY created_at ASC LIMIT 40",
+            _Q_WORLD,
             (project_id,),
         ).fetchall()
         if world:
-            rows = [f"- {w['title']}（{w['category']}）：{_clip(w['content'] or '', 120)}" for w in world]
+            rows = [f"- {w['title']}（{w['category']}）：{_clip(w['content'], 120)}" for w in world]
             chunks.append("【世界观设定】\n" + "\n".join(rows) + "\n")
 
         foreshadow = db.execute(
-            "SELECT name, description, status FROM foreshadowing "
-            "WHERE project_id = ? ORDER BY created_at ASC LIMIT 40",
+            _Q_FORESHADOW,
             (project_id,),
         ).fetchall()
         if foreshadow:
-            rows = [f"- {f['name']}（{f['status']}）：{_clip(f['description'] or '', 120)}" for f in foreshadow]
+            rows = [f"- {f['name']}（{f['status']}）：{_clip(f['description'], 120)}" for f in foreshadow]
             chunks.append("【伏笔与线索】\n" + "\n".join(rows) + "\n")
 
         outlines = db.execute(
-            "SELECT phase, title, content FROM outlines "
-            "WHERE project_id = ? ORDER BY phase_order ASC LIMIT 12",
+            _Q_OUTLINES,
             (project_id,),
         ).fetchall()
         if outlines:
-            rows = [f"- [{o['phase']}] {o['title']}：{_clip(o['content'] or '', 120)}" for o in outlines]
+            rows = [f"- [{o['phase']}] {o['title']}：{_clip(o['content'], 120)}" for o in outlines]
             chunks.append("【大纲锚点】\n" + "\n".join(rows) + "\n")
 
     return "\n".join(chunks).strip() or "（该项目暂无可用设定）"
@@ -182,10 +176,12 @@ async def check_conflicts(req: ConflictRequest):
     llm = agent_router._llm
     if llm is None:
         return ConflictResponse(conflicts=[], summary="模型服务未初始化。")
-    model_name, temperature, prompt_override, enabled, max_tokens = _load_runtime_config(req.project_id)
+    model_name, temperature, prompt_override, enabled, max_tokens = await asyncio.to_thread(
+        _load_runtime_config, req.project_id
+    )
     if not enabled:
         return ConflictResponse(conflicts=[], summary="冲突审查已在项目设置中禁用。")
-    context_text = _load_review_context(req.project_id)
+    context_text = await asyncio.to_thread(_load_review_context, req.project_id)
 
     system_prompt = prompt_override or CONFLICT_REVIEW_SYSTEM_PROMPT
 
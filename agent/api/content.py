@@ -1,13 +1,24 @@
 """大纲 + 伏笔 + 世界观 CRUD API"""
+import asyncio
+import hashlib
 import json
 import re
+import sqlite3
+import string
 import logging
+import operator
+from collections import defaultdict
+from itertools import islice
+import ahocorasick
+import orjson
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Any, Optional, Literal
 from db import get_db
 from agents import router as agent_router
 from agents.default_prompts import REVIEWER_SYSTEM_PROMPT
+from api._json_scan import chat_until_json_object, decode_first_object, strip_fence
+from api._runtime_cache import TTLCache
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -25,11 +36,20 @@ class OutlineCreate(BaseModel):
     word_range: str = ""
 
 
+# 列表接口只取前端用到的列，新增的大字段列不会被顺带搬进列表响应
+_OUTLINE_LIST_COLUMNS = "id, project_id, structure, phase, phase_order, title, content, word_range, created_at"
+_FORESHADOW_LIST_COLUMNS = (
+    "f.id, f.project_id, f.name, f.description, f.category, f.importance, f.status, "
+    "f.plant_chapter_id, f.resolve_chapter_id, f.plant_text, f.resolve_text, f.created_at"
+)
+_WORLDBUILDING_LIST_COLUMNS = "id, project_id, category, title, content, parent_id, sort_order, created_at"
+
+
 @router.get("/outlines")
 def list_outlines(project_id: str):
     with get_db() as db:
         rows = db.execute(
-            "SELECT * FROM outlines WHERE project_id = ? ORDER BY phase_order",
+            f"SELECT {_OUTLINE_LIST_COLUMNS} FROM outlines WHERE project_id = ? ORDER BY phase_order",
             (project_id,),
         ).fetchall()
         return [dict(r) for r in rows]
@@ -38,15 +58,11 @@ def list_outlines(project_id: str):
 @router.post("/outlines")
 def create_outline(req: OutlineCreate):
     with get_db() as db:
-        db.execute(
+        row = db.execute(
             "INSERT INTO outlines (project_id, structure, phase, phase_order, title, content, word_range) "
-            "VALUES (?,?,?,?,?,?,?)",
+            "VALUES (?,?,?,?,?,?,?) RETURNING *",
             (req.project_id, req.structure, req.phase, req.phase_order,
              req.title, req.content, req.word_range),
-        )
-        row = db.execute(
-            "SELECT * FROM outlines WHERE project_id = ? ORDER BY created_at DESC LIMIT 1",
-            (req.project_id,),
         ).fetchone()
         return dict(row)
 
@@ -149,7 +165,7 @@ class AITracePreviewResponse(BaseModel):
 
 
 def _clip(text: str, limit: int) -> str:
-    s = str(text or "").strip()
+    s = text.strip() if isinstance(text, str) else str(text or "").strip()
     if len(s) <= limit:
         return s
     return s[:limit] + "..."
@@ -275,11 +291,106 @@ AI_TRACE_PATTERNS: list[dict[str, Any]] = [
 ]
 
 
+# 纯字面量交替（如 "(专家认为|据悉|...)"）不走正则，统一交给一个 Aho-Corasick 自动机单遍扫描
+_LITERAL_ALTERNATION_RE = re.compile(r"^\(?([^\\.^$*+?{}\[\]()|]+(?:\|[^\\.^$*+?{}\[\]()|]+)*)\)?$")
+
+
+def _split_literal_alternation(regex: str) -> Optional[list[str]]:
+    matched = _LITERAL_ALTERNATION_RE.match(regex)
+    if not matched or regex.startswith("(") != regex.endswith(")"):
+        return None
+    literals = matched.group(1).split("|")
+    # IGNORECASE 对含大小写字母的字面量有意义，这类保留为正则
+    if any(lit.lower() != lit or lit.upper() != lit for lit in literals):
+        return None
+    return literals
+
+
+_AITraceRule = tuple[str, str, str, float, list[re.Pattern[str] | int]]
+
+
+def _compile_ai_trace_patterns() -> tuple[list[_AITraceRule], ahocorasick.Automaton, int]:
+    """返回 (每个规则的 (id, name, advice, weight, 扫描单元), 字面量自动机, 字面量单元数)。
+
+    扫描单元要么是预编译正则，要么是字面量单元编号（命中由自动机给出）。
+    """
+    compiled: list[_AITraceRule] = []
+    literal_owners: dict[str, list[tuple[int, int]]] = {}
+    literal_units = 0
+    for pattern in AI_TRACE_PATTERNS:
+        units: list[re.Pattern[str] | int] = []
+        for regex in pattern["regexes"]:
+            literals = _split_literal_alternation(regex)
+            if literals:
+                for alt_idx, lit in enumerate(literals):
+                    literal_owners.setdefault(lit, []).append((literal_units, alt_idx))
+                units.append(literal_units)
+                literal_units += 1
+                continue
+            try:
+                units.append(re.compile(regex, re.IGNORECASE))
+            except re.error:
+                logger.warning("Invalid AI trace regex skipped: id=%s regex=%s", pattern["id"], regex)
+        compiled.append((pattern["id"], pattern["name"], pattern["advice"], float(pattern["weight"]), units))
+    automaton = ahocorasick.Automaton()
+    for lit, owners in literal_owners.items():
+        automaton.add_word(lit, (len(lit), owners))
+    if literal_owners:
+        automaton.make_automaton()
+    return compiled, automaton, literal_units
+
+
+_AI_TRACE_COMPILED, _AI_TRACE_AUTOMATON, _AI_TRACE_LITERAL_UNITS = _compile_ai_trace_patterns()
+# 全部正则单元合成一个交替式：先单遍定位最早可能命中的位置，整段无命中时跳过逐条 finditer
+_AI_TRACE_REGEX_GATE: Optional[re.Pattern[str]] = None
+_gate_units = [u.pattern for *_, units in _AI_TRACE_COMPILED for u in units if not isinstance(u, int)]
+if _gate_units:
+    _AI_TRACE_REGEX_GATE = re.compile(
+        "|".join(f"(?P<u{idx}>{regex})" for idx, regex in enumerate(_gate_units)), re.IGNORECASE
+    )
+del _gate_units
+# 低严格度只扫描前 N 字，限制单次请求的最坏扫描量
+AI_TRACE_LOW_SCAN_LIMIT = 20000
+
+
+def _ai_trace_scan_limit(text_len: int, strictness: str) -> int:
+    if strictness == "low":
+        return min(text_len, AI_TRACE_LOW_SCAN_LIMIT)
+    return text_len
+
+
+def _scan_ai_trace_literals(source: str, scan_limit: int) -> list[list[tuple[int, int]]]:
+    """单遍扫描全部字面量，按单元还原 re.finditer 的最左优先、互不重叠语义。"""
+    candidates: list[list[tuple[int, int, int]]] = [[] for _ in range(_AI_TRACE_LITERAL_UNITS)]
+    if _AI_TRACE_LITERAL_UNITS:
+        for end_idx, (lit_len, owners) in _AI_TRACE_AUTOMATON.iter(source, 0, scan_limit):
+            start = end_idx - lit_len + 1
+            for unit, alt_idx in owners:
+                candidates[unit].append((start, alt_idx, end_idx + 1))
+    spans: list[list[tuple[int, int]]] = []
+    for unit_candidates in candidates:
+        unit_candidates.sort()
+        unit_spans: list[tuple[int, int]] = []
+        pos = 0
+        for start, _, end in unit_candidates:
+            # 同一起点按交替顺序取第一个，与正则回溯顺序一致
+            if start >= pos:
+                unit_spans.append((start, end))
+                pos = end
+        spans.append(unit_spans)
+    return spans
+
+
 def _build_evidence_snippet(text: str, start: int, end: int, window: int = 24) -> str:
     source = str(text or "")
     left = max(0, start - window)
     right = min(len(source), end + window)
-    snippet = source[left:right].replace("\n", " ").strip()
+    snippet = source[left:right]
+    # 段落内部的窗口通常不含换行、两端也不是空白，此时省去 replace/strip 的复制
+    if "\n" in snippet:
+        snippet = snippet.replace("\n", " ")
+    if snippet and (snippet[0].isspace() or snippet[-1].isspace()):
+        snippet = snippet.strip()
     if left > 0:
         snippet = "..." + snippet
     if right < len(source):
@@ -290,8 +401,15 @@ def _build_evidence_snippet(text: str, start: int, end: int, window: int = 24) -
 def _calc_ai_trace_score(hits: list[dict[str, Any]], text_len: int, strictness: str) -> tuple[int, str]:
     if not hits:
         return 8, "low"
-    unique_patterns = len({str(h.get("pattern_id") or "") for h in hits if str(h.get("pattern_id") or "")})
-    total_weight = sum(float(h.get("weight", 0.0) or 0.0) for h in hits)
+    # 单次遍历同时统计规则种类与总权重
+    pattern_ids: set[str] = set()
+    total_weight = 0.0
+    for h in hits:
+        pid = h.get("pattern_id")
+        if pid:
+            pattern_ids.add(str(pid))
+        total_weight += float(h.get("weight", 0.0) or 0.0)
+    unique_patterns = len(pattern_ids)
     hit_count = len(hits)
     length_base = max(1, int(text_len / 400))
     density = min(15.0, (hit_count / length_base) * 2.2)
@@ -328,6 +446,9 @@ def _summarize_ai_trace(hits: list[dict[str, Any]], score: int, level: str) -> s
     return f"检测到 {len(hits)} 处疑似 AI 文风痕迹，风险{labels.get(level, '中')}（{score}/100），主要集中在：{'、'.join(top_names) or '表达模板化'}。"
 
 
+_ai_trace_hit_rank = operator.itemgetter(0, 1)
+
+
 def _detect_ai_trace_hits(text: str, strictness: str, max_hits: int) -> list[dict[str, Any]]:
     source = str(text or "")
     if not source.strip():
@@ -339,38 +460,39 @@ def _detect_ai_trace_hits(text: str, strictness: str, max_hits: int) -> list[dic
     elif strictness == "high":
         min_conf = 0.18
 
-    hits: list[dict[str, Any]] = []
+    hits: list[tuple[float, float, str, str, str, str, int, int]] = []
+    # 去重键依赖证据片段文本，片段仍需在去重前生成
     seen_signatures: set[str] = set()
-    for pattern in AI_TRACE_PATTERNS:
+    scan_limit = _ai_trace_scan_limit(len(source), strictness)
+    literal_spans = _scan_ai_trace_literals(source, scan_limit)
+    # 任一正则单元的命中都不早于合成正则的首个命中起点，从该处开始 finditer 结果不变
+    gate = _AI_TRACE_REGEX_GATE.search(source, 0, scan_limit) if _AI_TRACE_REGEX_GATE else None
+    regex_pos = gate.start() if gate else -1
+    # 干净文本：字面量自动机与合成正则都没有命中，直接返回，不再进入逐规则循环
+    if regex_pos < 0 and not any(literal_spans):
+        return []
+    for pid, pname, padvice, pweight, units in _AI_TRACE_COMPILED:
         pattern_hits = 0
-        for regex in pattern["regexes"]:
-            try:
-                iterator = re.finditer(regex, source, re.IGNORECASE)
-            except re.error:
+        for unit in units:
+            if isinstance(unit, int):
+                spans = literal_spans[unit]
+            elif regex_pos < 0:
                 continue
-            for matched in iterator:
-                evidence = _build_evidence_snippet(source, matched.start(), matched.end())
-                signature = f"{pattern['id']}::{evidence}"
+            else:
+                spans = (m.span() for m in unit.finditer(source, regex_pos, scan_limit))
+            for start, end in spans:
+                evidence = _build_evidence_snippet(source, start, end)
+                signature = f"{pid}::{evidence}"
                 if signature in seen_signatures:
                     continue
                 seen_signatures.add(signature)
-                matched_text = str(matched.group(0) or "").strip()
+                matched_text = source[start:end].strip()
                 confidence = 0.32 + min(0.35, len(matched_text) / 90) + min(0.2, pattern_hits * 0.08)
                 confidence = max(0.0, min(0.99, confidence))
                 if confidence < min_conf:
                     continue
-                hits.append(
-                    {
-                        "pattern_id": pattern["id"],
-                        "pattern_name": pattern["name"],
-                        "evidence": evidence,
-                        "confidence": confidence,
-                        "advice": pattern["advice"],
-                        "weight": float(pattern["weight"]),
-                        "start": int(matched.start()),
-                        "end": int(matched.end()),
-                    }
-                )
+                # 先收集轻量元组，排序截断后再组装返回的 dict
+                hits.append((pweight, confidence, pid, pname, padvice, evidence, start, end))
                 pattern_hits += 1
                 if pattern_hits >= 2 or len(hits) >= safe_limit:
                     break
@@ -378,75 +500,49 @@ def _detect_ai_trace_hits(text: str, strictness: str, max_hits: int) -> list[dic
                 break
         if len(hits) >= safe_limit:
             break
-    hits.sort(key=lambda item: (float(item.get("weight", 0.0)), float(item.get("confidence", 0.0))), reverse=True)
-    return hits[:safe_limit]
+    hits.sort(key=_ai_trace_hit_rank, reverse=True)
+    return [
+        {
+            "pattern_id": pid,
+            "pattern_name": pname,
+            "evidence": evidence,
+            "confidence": confidence,
+            "advice": padvice,
+            "weight": pweight,
+            "start": start,
+            "end": end,
+        }
+        for pweight, confidence, pid, pname, padvice, evidence, start, end in hits[:safe_limit]
+    ]
 
 
-def _extract_first_json_object(text: str) -> str:
-    if not text:
-        return ""
-    start: Optional[int] = None
-    depth = 0
-    in_string = False
-    escape = False
-    for idx, ch in enumerate(text):
-        if in_string:
-            if escape:
-                escape = False
-            elif ch == "\\":
-                escape = True
-            elif ch == '"':
-                in_string = False
-            continue
-        if ch == '"':
-            in_string = True
-            continue
-        if ch == "{":
-            if depth == 0:
-                start = idx
-            depth += 1
-            continue
-        if ch == "}" and depth > 0:
-            depth -= 1
-            if depth == 0 and start is not None:
-                return text[start: idx + 1]
-    return ""
+def _parse_json_payload(raw: str) -> dict[str, Any]:
+    return decode_first_object(raw) or {}
 
 
-def _parse_json_payload(raw: str) -> dict[str, Any]:
-    text = str(raw or "").strip()
-    if not text:
-        return {}
-    if text.startswith("```"):
-        text = re.sub(r"^```(?:json)?\s*", "", text)
-        text = re.sub(r"\s*```$", "", text)
-    candidates = [text]
-    extracted = _extract_first_json_object(text)
-    if extracted and extracted != text:
-        candidates.append(extracted)
-    for c in candidates:
-        try:
-            parsed = json.loads(c)
-            if isinstance(parsed, dict):
-                return parsed
-        except Exception:
-            continue
-    return {}
+_FS_IMPORTANCE = frozenset(("高", "中", "低"))
+_FS_STATUS = frozenset(("planted", "hinted", "resolved"))
+_FS_STATUS_PLANT = frozenset(("planted", "hinted"))
 
 
 def _normalize_foreshadow_item(raw: Any) -> Optional[dict[str, Any]]:
     if not isinstance(raw, dict):
         return None
-    name = _clip(raw.get("name", ""), 40)
-    desc = _clip(raw.get("description", ""), 260)
+    name_raw = raw.get("name")
+    desc_raw = raw.get("description")
+    # 缺名称或描述的条目直接丢弃，不再逐字段 clip
+    if not name_raw or not desc_raw:
+        return None
+    name = _clip(name_raw, 40)
+    desc = _clip(desc_raw, 260)
     if len(name) < 2 or len(desc) < 6:
         return None
     category = _clip(raw.get("category", "剧情") or "剧情", 20)
     importance = str(raw.get("importance", "中") or "中").strip()
-    if importance not in {"高", "中", "低"}:
+    if importance not in _FS_IMPORTANCE:
         importance = "中"
     status = str(raw.get("status", "hinted") or "hinted").strip().lower()
-    if status not in {"planted", "hinted", "resolved"}:
+    if status not in _FS_STATUS:
         status = "hinted"
     try:
         confidence = float(raw.get("confidence", 0.0) or 0.0)
@@ -457,7 +553,7 @@ def _normalize_foreshadow_item(raw: Any) -> Optional[dict[str, Any]]:
     resolve_text = _clip(raw.get("resolve_text", ""), 260)
     if status == "resolved" and not resolve_text:
         resolve_text = desc
-    if status in {"planted", "hinted"} and not plant_text:
+    if status in _FS_STATUS_PLANT and not plant_text:
         plant_text = desc
     return {
         "name": name,
@@ -471,36 +567,64 @@ def _normalize_foreshadow_item(raw: Any) -> Optional[dict[str, Any]]:
     }
 
 
-def _load_extract_runtime(project_id: str) -> tuple[str, float, int]:
+_extract_runtime_cache = TTLCache(maxsize=512, ttl=60.0)
+
+
+def _load_extract_runtime(project_id: str, db=None) -> tuple[str, float, int]:
+    cached = _extract_runtime_cache.get(project_id)
+    if cached is not None:
+        return cached
+    if db is None:
+        with get_db() as db:
+            return _load_extract_runtime(project_id, db)
     default_model = "claude-sonnet-4"
     default_temp = 0.2
     default_max_tokens = 2200
-    with get_db() as db:
-        row = db.execute(
-            "SELECT model_main FROM projects WHERE id = ?",
-            (project_id,),
-        ).fetchone()
+    row = db.execute(
+        "SELECT model_main FROM projects WHERE id = ?",
+        (project_id,),
+    ).fetchone()
     if not row:
         raise HTTPException(404, "项目不存在")
     model = str((row["model_main"] or "")).strip() or default_model
-    return model, default_temp, default_max_tokens
-
-
-def _load_chapter_extract_text(project_id: str, chapter_id: str) -> tuple[str, str]:
-    with get_db() as db:
-        chapter = db.execute(
-            "SELECT id, chapter_num, title, synopsis FROM chapters WHERE id = ? AND project_id = ?",
-            (chapter_id, project_id),
-        ).fetchone()
-        if not chapter:
-            raise HTTPException(404, "章节不存在")
-        paras = db.execute(
-            "SELECT content FROM chapter_paragraphs WHERE chapter_id = ? ORDER BY para_index ASC LIMIT 120",
-            (chapter_id,),
-        ).fetchall()
+    runtime = (model, default_temp, default_max_tokens)
+    _extract_runtime_cache.set(project_id, runtime)
+    return runtime
+
+
+def _load_chapter_extract_text(
+    project_id: str, chapter_id: str, max_chars: int = 14000, db=None
+) -> tuple[str, str]:
+    """读取章节正文；调用方只会用到前 max_chars 字，累计超出（含少量余量）后即停止读取段落。
+
+    传入 db 时复用调用方的连接，否则自行打开。
+    """
+    if db is None:
+        with get_db() as db:
+            return _load_chapter_extract_text(project_id, chapter_id, max_chars, db)
+    budget = max_chars + 512
+    chunks: list[str] = []
+    total = 0
+    chapter = db.execute(
+        "SELECT id, chapter_num, title, synopsis FROM chapters WHERE id = ? AND project_id = ?",
+        (chapter_id, project_id),
+    ).fetchone()
+    if not chapter:
+        raise HTTPException(404, "章节不存在")
+    for p in db.execute(
+        "SELECT content FROM chapter_paragraphs WHERE chapter_id = ? ORDER BY para_index ASC LIMIT 120",
+        (chapter_id,),
+    ):
+        content = p["content"] or ""
+        if not content.strip():
+            continue
+        chunks.append(content)
+        total += len(content) + 1
+        if total >= budget:
+            break
     title = f"第{chapter['chapter_num']}章《{chapter['title'] or '未命名'}》"
     synopsis = str(chapter["synopsis"] or "").strip()
-    para_text = "\n".join([str(p["content"] or "") for p in paras if str(p["content"] or "").strip()])
+    para_text = "\n".join(chunks)
     source_text = para_text if para_text else synopsis
     if not source_text:
         raise HTTPException(400, "当前章节暂无正文与梗概，无法提取伏笔")
@@ -511,7 +635,7 @@ def _load_chapter_extract_text(project_id: str, chapter_id: str) -> tuple[str, s
 def list_foreshadowing(project_id: str):
     with get_db() as db:
         rows = db.execute(
-            "SELECT f.*, c1.title as plant_chapter, c2.title as resolve_chapter "
+            f"SELECT {_FORESHADOW_LIST_COLUMNS}, c1.title as plant_chapter, c2.title as resolve_chapter "
             "FROM foreshadowing f "
             "LEFT JOIN chapters c1 ON f.plant_chapter_id = c1.id "
             "LEFT JOIN chapters c2 ON f.resolve_chapter_id = c2.id "
@@ -524,15 +648,11 @@ def list_foreshadowing(project_id: str):
 @router.post("/foreshadowing")
 def create_foreshadowing(req: ForeshadowingCreate):
     with get_db() as db:
-        db.execute(
+        row = db.execute(
             "INSERT INTO foreshadowing (project_id, name, description, category, importance, "
-            "plant_chapter_id, plant_text) VALUES (?,?,?,?,?,?,?)",
+            "plant_chapter_id, plant_text) VALUES (?,?,?,?,?,?,?) RETURNING *",
             (req.project_id, req.name, req.description, req.category,
              req.importance, req.plant_chapter_id, req.plant_text),
-        )
-        row = db.execute(
-            "SELECT * FROM foreshadowing WHERE project_id = ? ORDER BY created_at DESC LIMIT 1",
-            (req.project_id,),
         ).fetchone()
         return dict(row)
 
@@ -571,25 +691,24 @@ async def extract_foreshadow_preview(req: ForeshadowExtractPreviewRequest):
     source_text = str(req.text or "").strip()
     chapter_title = ""
     chapter_id = str(req.chapter_id or "").strip() or None
-    if chapter_id:
-        chapter_title, chapter_source_text = _load_chapter_extract_text(project_id, chapter_id)
-        if not source_text:
-            source_text = chapter_source_text
-    if not source_text:
-        raise HTTPException(400, "请提供章节ID或正文文本")
-
     limit = max(1, min(20, int(req.limit or 8)))
 
+    # 章节正文、已有伏笔与运行时配置共用一个连接读取
     with get_db() as db:
+        if chapter_id:
+            chapter_title, chapter_source_text = _load_chapter_extract_text(project_id, chapter_id, db=db)
+            if not source_text:
+                source_text = chapter_source_text
+        if not source_text:
+            raise HTTPException(400, "请提供章节ID或正文文本")
         existing_rows = db.execute(
-            "SELECT name, description FROM foreshadowing WHERE project_id = ? ORDER BY created_at DESC LIMIT 80",
+            "SELECT name, description FROM foreshadowing WHERE project_id = ? ORDER BY created_at DESC LIMIT 30",
             (project_id,),
         ).fetchall()
-    existing_text = "\n".join([f"- {r['name']}：{_clip(r['description'] or '', 80)}" for r in existing_rows[:30]])
+        model, temperature, max_tokens = _load_extract_runtime(project_id, db)
+    existing_text = "\n".join([f"- {r['name']}：{_clip(r['description'] or '', 80)}" for r in existing_rows])
     existing_block = f"\n\n【已有伏笔（避免重复）】\n{existing_text}" if existing_text else ""
 
-    model, temperature, max_tokens = _load_extract_runtime(project_id)
-
     prompt = f"""
 你是小说伏笔提取器。请从文本中识别“值得入库追踪”的伏笔候选。
 
@@ -651,7 +770,7 @@ async def extract_foreshadow_preview(req: ForeshadowExtractPreviewRequest):
         if key in seen:
             continue
         seen.add(key)
-        deduped.append(ForeshadowExtractItem(**item))
+        deduped.append(ForeshadowExtractItem.model_construct(**item))
         if len(deduped) >= limit:
             break
 
@@ -694,27 +813,37 @@ def commit_foreshadow_extract(req: ForeshadowExtractCommitRequest):
         if not proj:
             raise HTTPException(404, "项目不存在")
 
+        # 一次取回同名伏笔的去重键，避免逐条 SELECT
+        existing_keys: set[tuple[str, str, str, str]] = set()
+        if normalized_items:
+            names = list({item["name"] for item in normalized_items})
+            placeholders = ",".join("?" for _ in names)
+            for r in db.execute(
+                "SELECT name, description, plant_chapter_id, resolve_chapter_id FROM foreshadowing "
+                f"WHERE project_id = ? AND name IN ({placeholders})",
+                (project_id, *names),
+            ):
+                existing_keys.add(
+                    (r["name"], r["description"], r["plant_chapter_id"] or "", r["resolve_chapter_id"] or "")
+                )
+
         for item in normalized_items:
             status = item["status"]
-            plant_chapter_id = chapter_id if status in {"planted", "hinted"} else None
+            plant_chapter_id = chapter_id if status in _FS_STATUS_PLANT else None
             resolve_chapter_id = chapter_id if status == "resolved" else None
-            plant_text = item["plant_text"] if status in {"planted", "hinted"} else ""
+            plant_text = item["plant_text"] if status in _FS_STATUS_PLANT else ""
             resolve_text = item["resolve_text"] if status == "resolved" else ""
 
-            existed = db.execute(
-                "SELECT id FROM foreshadowing WHERE project_id = ? AND name = ? AND description = ? "
-                "AND COALESCE(plant_chapter_id, '') = COALESCE(?, '') "
-                "AND COALESCE(resolve_chapter_id, '') = COALESCE(?, '') LIMIT 1",
-                (project_id, item["name"], item["description"], plant_chapter_id, resolve_chapter_id),
-            ).fetchone()
-            if existed:
+            dedupe_key = (item["name"], item["description"], plant_chapter_id or "", resolve_chapter_id or "")
+            if dedupe_key in existing_keys:
                 skipped += 1
                 continue
+            existing_keys.add(dedupe_key)
 
-            db.execute(
+            row = db.execute(
                 "INSERT INTO foreshadowing (project_id, name, description, category, importance, status, "
                 "plant_chapter_id, resolve_chapter_id, plant_text, resolve_text) "
-                "VALUES (?,?,?,?,?,?,?,?,?,?)",
+                "VALUES (?,?,?,?,?,?,?,?,?,?) RETURNING *",
                 (
                     project_id,
                     item["name"],
@@ -727,10 +856,6 @@ def commit_foreshadow_extract(req: ForeshadowExtractCommitRequest):
                     plant_text,
                     resolve_text,
                 ),
-            )
-            row = db.execute(
-                "SELECT * FROM foreshadowing WHERE project_id = ? ORDER BY created_at DESC LIMIT 1",
-                (project_id,),
             ).fetchone()
             if row:
                 created.append(dict(row))
@@ -753,7 +878,7 @@ class WorldbuildingCreate(BaseModel):
 def list_worldbuilding(project_id: str):
     with get_db() as db:
         rows = db.execute(
-            "SELECT * FROM worldbuilding WHERE project_id = ? ORDER BY category, sort_order",
+            f"SELECT {_WORLDBUILDING_LIST_COLUMNS} FROM worldbuilding WHERE project_id = ? ORDER BY category, sort_order",
             (project_id,),
         ).fetchall()
         return [dict(r) for r in rows]
@@ -762,13 +887,9 @@ def list_worldbuilding(project_id: str):
 @router.post("/worldbuilding")
 def create_worldbuilding(req: WorldbuildingCreate):
     with get_db() as db:
-        db.execute(
-            "INSERT INTO worldbuilding (project_id, category, title, content, parent_id) VALUES (?,?,?,?,?)",
-            (req.project_id, req.category, req.title, req.content, req.parent_id),
-        )
         row = db.execute(
-            "SELECT * FROM worldbuilding WHERE project_id = ? ORDER BY created_at DESC LIMIT 1",
-            (req.project_id,),
+            "INSERT INTO worldbuilding (project_id, category, title, content, parent_id) VALUES (?,?,?,?,?) RETURNING *",
+            (req.project_id, req.category, req.title, req.content, req.parent_id),
         ).fetchone()
         return dict(row)
 
@@ -846,13 +967,17 @@ class EntityCandidateCommitRequest(BaseModel):
     operations: list[EntityCandidateCommitOperation] = []
 
 
+_ENTITY_TYPE_CHARACTER_KEYWORDS = ("character", "角色", "人物", "人名", "person")
+_ENTITY_TYPE_WORLD_KEYWORDS = ("world", "setting", "worldbuilding", "世界", "设定", "地点", "势力", "规则", "组织", "道具", "历史")
+
+
 def _normalize_entity_type(raw: Any) -> str:
     v = str(raw or "").strip().lower()
     if not v:
         return ""
-    if any(k in v for k in ("character", "角色", "人物", "人名", "person")):
+    if any(k in v for k in _ENTITY_TYPE_CHARACTER_KEYWORDS):
         return "character"
-    if any(k in v for k in ("world", "setting", "worldbuilding", "世界", "设定", "地点", "势力", "规则", "组织", "道具", "历史")):
+    if any(k in v for k in _ENTITY_TYPE_WORLD_KEYWORDS):
         return "worldbuilding"
     return ""
 
@@ -909,21 +1034,26 @@ def _normalize_gender(raw: Any) -> str:
     return _clip(v, 12)
 
 
+_AGE_WS = re.compile(r"\s+")
+_AGE_INT = re.compile(r"\d{1,3}")
+_AGE_RANGE = re.compile(r"\d{1,3}[~\-～到]\d{1,3}(?:岁)?")
+
+
 def _normalize_age(raw: Any) -> str:
-    v = re.sub(r"\s+", "", str(raw or "").strip())
+    v = _AGE_WS.sub("", str(raw or "").strip())
     if not v:
         return ""
     lower = v.lower()
     if any(k in v for k in ("未知", "不明", "未说明", "未设定", "未确定")) or any(k in lower for k in ("unknown", "unspecified", "n/a", "na")):
         return "未知"
-    if re.fullmatch(r"\d{1,3}", v):
+    if _AGE_INT.fullmatch(v):
         try:
             n = int(v)
         except Exception:
             n = 0
         if 0 < n < 160:
             return f"{n}岁"
-    if re.fullmatch(r"\d{1,3}[~\-～到]\d{1,3}(?:岁)?", v):
+    if _AGE_RANGE.fullmatch(v):
         return _clip(v if v.endswith("岁") else f"{v}岁", 20)
     return _clip(v, 20)
 
@@ -984,19 +1114,63 @@ def _normalize_entity_candidate_item(raw: Any) -> Optional[dict[str, Any]]:
     }
 
 
-def _load_existing_entity_reference(project_id: str) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+def _load_existing_entity_reference(
+    project_id: str,
+    db=None,
+) -> tuple[list[sqlite3.Row], list[sqlite3.Row]]:
+    """只供渲染提示词时按列名读取，直接返回 Row，不再逐行转成 dict。"""
+    if db is None:
+        with get_db() as db:
+            return _load_existing_entity_reference(project_id, db)
+    chars = db.execute(
+        "SELECT name, category, gender, age, identity FROM characters "
+        "WHERE project_id = ? ORDER BY created_at ASC LIMIT 60",
+        (project_id,),
+    ).fetchall()
+    world = db.execute(
+        "SELECT title, category, content FROM worldbuilding "
+        "WHERE project_id = ? ORDER BY created_at ASC LIMIT 60",
+        (project_id,),
+    ).fetchall()
+    return chars, world
+
+
+# 键为 (project_id, 版本号)；版本号由 020 迁移的触发器在角色/世界观增删改时递增
+_entity_reference_blocks_cache = TTLCache(maxsize=256, ttl=600.0)
+
+
+def _load_entity_reference_blocks(project_id: str) -> tuple[str, str]:
+    """渲染抽取提示词中的“已有角色/已有世界观”两段；数据未变时直接复用，提示词前缀保持逐字节一致。"""
     with get_db() as db:
-        chars = db.execute(
-            "SELECT name, category, gender, age, identity FROM characters "
-            "WHERE project_id = ? ORDER BY created_at ASC LIMIT 60",
-            (project_id,),
-        ).fetchall()
-        world = db.execute(
-            "SELECT title, category, content FROM worldbuilding "
-            "WHERE project_id = ? ORDER BY created_at ASC LIMIT 60",
+        row = db.execute(
+            "SELECT version FROM entity_reference_versions WHERE project_id = ?",
             (project_id,),
-        ).fetchall()
-    return [dict(r) for r in chars], [dict(r) for r in world]
+        ).fetchone()
+        cache_key = (project_id, row["version"] if row else 0)
+        cached = _entity_reference_blocks_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        # 未命中时两段查询复用查版本号的连接，不再另开一次连接
+        chars, world = _load_existing_entity_reference(project_id, db)
+    chars_block = (
+        "\n".join(
+            f"- {c['name']}（{c['category']}/{c['gender']}/{c['age']}）：{_clip(c['identity'] or '', 60)}"
+            for c in chars[:24]
+        ) if chars else "无"
+    )
+    world_block = (
+        "\n".join(
+            f"- {w['title']}（{w['category']}）：{_clip(w['content'] or '', 70)}"
+            for w in world[:24]
+        ) if world else "无"
+    )
+    blocks = (chars_block, world_block)
+    _entity_reference_blocks_cache.set(cache_key, blocks)
+    return blocks
+
+
+# 键为 (project_id, 提示词摘要)；项目设置变更时随 invalidate_project 一起清掉
+_entity_extract_llm_cache = TTLCache(maxsize=128, ttl=600.0)
 
 
 async def _extract_entity_candidates_items(
@@ -1015,7 +1189,9 @@ async def _extract_entity_candidates_items(
     chapter_title = ""
     cleaned_chapter_id = str(chapter_id or "").strip() or None
     if cleaned_chapter_id:
-        chapter_title, chapter_source_text = _load_chapter_extract_text(project_id, cleaned_chapter_id)
+        chapter_title, chapter_source_text = await asyncio.to_thread(
+            _load_chapter_extract_text, project_id, cleaned_chapter_id
+        )
         if not source_text:
             source_text = chapter_source_text
     if not source_text:
@@ -1030,21 +1206,12 @@ async def _extract_entity_candidates_items(
             raise HTTPException(500, "模型服务未初始化")
         return chapter_title, []
 
-    model, temperature, max_tokens = _load_extract_runtime(project_id)
-    chars, world = _load_existing_entity_reference(project_id)
-    chars_block = (
-        "\n".join(
-            f"- {c.get('name', '')}（{c.get('category', '')}/{c.get('gender', '')}/{c.get('age', '')}）：{_clip(c.get('identity', '') or '', 60)}"
-            for c in chars[:24]
-        ) if chars else "无"
-    )
-    world_block = (
-        "\n".join(
-            f"- {w.get('title', '')}（{w.get('category', '')}）：{_clip(w.get('content', '') or '', 70)}"
-            for w in world[:24]
-        ) if world else "无"
-    )
+    # 同步 sqlite 读取放到线程里，避免阻塞事件循环上并发的模型调用
+    model, temperature, max_tokens = await asyncio.to_thread(_load_extract_runtime, project_id)
+    chars_block, world_block = await asyncio.to_thread(_load_entity_reference_blocks, project_id)
     safe_limit = max(1, min(20, int(limit or 10)))
+    # source_text 已 strip，未超长时原样拼入提示词，不再经 _clip 复制一遍
+    clipped_text = source_text if len(source_text) <= 14000 else source_text[:14000] + "..."
 
     prompt = f"""
 你是小说设定抽取器。请从章节文本中提取“适合加入设定库”的候选，仅输出 JSON。
@@ -1086,28 +1253,40 @@ async def _extract_entity_candidates_items(
 {chapter_title or "未指定"}
 
 【待分析文本】
-{_clip(source_text, 14000)}
+{clipped_text}
 """.strip()
 
-    raw = await llm.chat(
-        model=model,
-        messages=[
-            {"role": "system", "content": "你是严格JSON抽取器，只输出合法JSON对象。"},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=min(max(temperature, 0.0), 0.4),
-        max_tokens=max_tokens,
+    safe_temperature = min(max(temperature, 0.0), 0.4)
+    # 提示词已包含已有设定与正文，完全相同的提示词（如预览后紧接着入库）直接复用上次的模型输出
+    cache_key = (
+        project_id,
+        hashlib.sha1(f"{model}|{safe_temperature}|{max_tokens}|{prompt}".encode("utf-8")).hexdigest(),
     )
+    raw_items = _entity_extract_llm_cache.get(cache_key)
+    if raw_items is None:
+        raw = await chat_until_json_object(
+            llm,
+            model=model,
+            messages=[
+                {"role": "system", "content": "你是严格JSON抽取器，只输出合法JSON对象。"},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=safe_temperature,
+            max_tokens=max_tokens,
+        )
 
-    payload = _parse_json_payload(raw)
-    raw_items = payload.get("items", []) if isinstance(payload.get("items"), list) else []
+        # 与 chat_until_json_object 的停止条件用同一个扫描器，两边对“首个对象”的判定一致
+        payload = decode_first_object(raw) or {}
+        raw_items = payload.get("items", []) if isinstance(payload.get("items"), list) else []
+        if "items" in payload:
+            _entity_extract_llm_cache.set(cache_key, raw_items)
     deduped: list[dict[str, Any]] = []
-    seen: set[str] = set()
+    seen: set[tuple[str, str]] = set()
     for raw_item in raw_items:
         item = _normalize_entity_candidate_item(raw_item)
         if not item:
             continue
-        dedup_key = f"{item['entity_type']}::{str(item['name']).lower()}"
+        dedup_key = (item["entity_type"], item["name"].casefold())
         if dedup_key in seen:
             continue
         seen.add(dedup_key)
@@ -1117,6 +1296,41 @@ async def _extract_entity_candidates_items(
     return chapter_title, deduped
 
 
+# 与 str.strip() 相同的全部 Unicode 空白码位，供 SQL trim() 使用；须与 migration 018 的索引表达式逐字一致
+_SQL_TRIM_CHARS = (
+    "char(9, 10, 11, 12, 13, 28, 29, 30, 31, 32, 133, 160, 5760, 8192, 8193, 8194, 8195, 8196, "
+    "8197, 8198, 8199, 8200, 8201, 8202, 8232, 8233, 8239, 8287, 12288)"
+)
+_ENTITY_EXISTING_SQL = {
+    "character": f"SELECT 1 FROM characters WHERE project_id = ? AND trim(name, {_SQL_TRIM_CHARS}) = ? COLLATE NOCASE LIMIT 1",
+    "worldbuilding": f"SELECT 1 FROM worldbuilding WHERE project_id = ? AND trim(title, {_SQL_TRIM_CHARS}) = ? COLLATE NOCASE LIMIT 1",
+}
+_ENTITY_EXISTING_LABELS_SQL = {
+    "character": "SELECT name AS label FROM characters WHERE project_id = ?",
+    "worldbuilding": "SELECT title AS label FROM worldbuilding WHERE project_id = ?",
+}
+# 与 SQLite 内置 lower() 一致：只折叠 ASCII 字母
+_SQL_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _needs_unicode_lower(name: str) -> bool:
+    """NOCASE 只折叠 ASCII：名称含非 ASCII 的大小写字母，或可能与 K（U+212A）、İ（U+0130）小写后相同，需按 str.lower() 比较。"""
+    lowered = name.lower()
+    if "k" in lowered or "\u0307" in lowered:
+        return True
+    return any(not ch.isascii() and ch.lower() != ch.upper() for ch in name)
+
+
+# 入库时逐字段截断的上限，顺序与 INSERT 列顺序一致
+_ENTITY_CANDIDATE_CLIP_FIELDS: tuple[tuple[str, int], ...] = (
+    ("category", 20),
+    ("description", 320),
+    ("gender", 12),
+    ("age", 20),
+    ("source_excerpt", 220),
+)
+
+
 def _persist_entity_candidates(
     *,
     project_id: str,
@@ -1129,76 +1343,82 @@ def _persist_entity_candidates(
     inserted = 0
     skipped = 0
     saved: list[dict[str, Any]] = []
+    saved_ids: list[str] = []
     with get_db() as db:
-        existing_char_names = {
-            str(r["name"] or "").strip().lower()
-            for r in db.execute(
-                "SELECT name FROM characters WHERE project_id = ?",
-                (project_id,),
-            ).fetchall()
-            if str(r["name"] or "").strip()
-        }
-        existing_world_titles = {
-            str(r["title"] or "").strip().lower()
+        # 预取查重集合与写入放在同一个写事务里，避免并发抽取同时通过查重
+        db.execute("BEGIN IMMEDIATE")
+        # 一次取出全部待审候选，批内重复也靠这个集合拦截
+        pending_keys = {
+            (r["entity_type"], str(r["name"] or "").translate(_SQL_LOWER))
             for r in db.execute(
-                "SELECT title FROM worldbuilding WHERE project_id = ?",
+                "SELECT entity_type, name FROM entity_candidates WHERE project_id = ? AND status = 'pending'",
                 (project_id,),
-            ).fetchall()
-            if str(r["title"] or "").strip()
+            )
         }
 
+        # 需要 Unicode 大小写折叠的名称才按需取出整类已有名称，键与 str.strip().lower() 一致
+        existing_lowered: dict[str, set[str]] = {}
+
         for item in items:
             entity_type = str(item.get("entity_type") or "").strip()
             name = _clip(item.get("name", ""), 40)
             if not entity_type or not name:
                 skipped += 1
                 continue
-            lowered_name = name.lower()
-            if entity_type == "character" and lowered_name in existing_char_names:
-                skipped += 1
-                continue
-            if entity_type == "worldbuilding" and lowered_name in existing_world_titles:
-                skipped += 1
-                continue
+            # 只对本批候选逐个走 trim() + NOCASE 表达式索引探测，不再把整个项目的角色/世界观拉进内存；
+            # 已有名称可能带首尾空白入库，trim 的字符集与 str.strip() 相同
+            existing_sql = _ENTITY_EXISTING_SQL.get(entity_type)
+            if existing_sql:
+                if db.execute(existing_sql, (project_id, name)).fetchone():
+                    skipped += 1
+                    continue
+                if _needs_unicode_lower(name):
+                    lowered_names = existing_lowered.get(entity_type)
+                    if lowered_names is None:
+                        lowered_names = existing_lowered[entity_type] = {
+                            str(r["label"] or "").strip().lower()
+                            for r in db.execute(_ENTITY_EXISTING_LABELS_SQL[entity_type], (project_id,))
+                        }
+                    if name.lower() in lowered_names:
+                        skipped += 1
+                        continue
 
-            existed_pending = db.execute(
-                "SELECT id FROM entity_candidates "
-                "WHERE project_id = ? AND entity_type = ? AND lower(name) = lower(?) AND status = 'pending' "
-                "LIMIT 1",
-                (project_id, entity_type, name),
-            ).fetchone()
-            if existed_pending:
+            pending_key = (entity_type, name.translate(_SQL_LOWER))
+            if pending_key in pending_keys:
                 skipped += 1
                 continue
 
-            db.execute(
+            row = db.execute(
                 "INSERT INTO entity_candidates "
                 "(project_id, chapter_id, entity_type, name, category, description, gender, age, source_excerpt, confidence, status, target_id) "
-                "VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                "VALUES (?,?,?,?,?,?,?,?,?,?,?,?) RETURNING id",
                 (
                     project_id,
                     chapter_id,
                     entity_type,
                     name,
-                    _clip(item.get("category", ""), 20),
-                    _clip(item.get("description", ""), 320),
-                    _clip(item.get("gender", ""), 12),
-                    _clip(item.get("age", ""), 20),
-                    _clip(item.get("source_excerpt", ""), 220),
+                    *[_clip(item.get(key, ""), limit) for key, limit in _ENTITY_CANDIDATE_CLIP_FIELDS],
                     _normalize_confidence(item.get("confidence", 0.0)),
                     "pending",
                     "",
                 ),
-            )
-            row = db.execute(
-                "SELECT ec.*, c.chapter_num, c.title AS chapter_title "
-                "FROM entity_candidates ec "
-                "LEFT JOIN chapters c ON c.id = ec.chapter_id "
-                "WHERE ec.rowid = last_insert_rowid()",
             ).fetchone()
             if row:
-                saved.append(dict(row))
+                saved_ids.append(row["id"])
+            pending_keys.add(pending_key)
             inserted += 1
+
+        # 插入完成后一次 JOIN 回查全部新行，代替逐行按 last_insert_rowid() 回查
+        if saved_ids:
+            rows = db.execute(
+                "SELECT ec.*, c.chapter_num, c.title AS chapter_title "
+                "FROM entity_candidates ec "
+                "LEFT JOIN chapters c ON c.id = ec.chapter_id "
+                f"WHERE ec.id IN ({','.join('?' * len(saved_ids))}) "
+                "ORDER BY ec.rowid",
+                saved_ids,
+            ).fetchall()
+            saved = [dict(r) for r in rows]
     return {"inserted": inserted, "skipped": skipped, "items": saved}
 
 
@@ -1212,21 +1432,28 @@ def _archive_previous_chapter_pending_candidates(
     if not clean_project_id or not clean_chapter_id:
         return 0
     with get_db() as db:
-        row = db.execute(
-            "SELECT COUNT(*) AS c FROM entity_candidates "
-            "WHERE project_id = ? AND chapter_id = ? AND status = 'pending'",
-            (clean_project_id, clean_chapter_id),
-        ).fetchone()
-        pending_count = int((row["c"] if row else 0) or 0)
-        if pending_count <= 0:
-            return 0
-        db.execute(
+        # 直接 UPDATE，归档条数取受影响行数，无需先 COUNT
+        cur = db.execute(
             "UPDATE entity_candidates "
             "SET status = 'ignored', updated_at = datetime('now') "
             "WHERE project_id = ? AND chapter_id = ? AND status = 'pending'",
             (clean_project_id, clean_chapter_id),
         )
-    return pending_count
+        return max(0, cur.rowcount)
+
+
+# 同一章节、同一正文的并发抽取只跑一次，其余调用等待同一个结果
+_entity_extract_inflight: dict[tuple[Any, ...], asyncio.Task] = {}
+# 同一项目的候选归档与入库串行执行：避免并发抽取各自判重后写入重复的待确认候选
+_entity_persist_locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
+def _on_entity_extract_done(key: tuple[Any, ...], task: asyncio.Task) -> None:
+    if _entity_extract_inflight.get(key) is task:
+        _entity_extract_inflight.pop(key, None)
+    # 没有等待者时避免 "exception was never retrieved" 告警
+    if not task.cancelled():
+        task.exception()
 
 
 async def _extract_and_store_entity_candidates(
@@ -1236,6 +1463,38 @@ async def _extract_and_store_entity_candidates(
     text: str,
     limit: int,
     strict: bool,
+) -> dict[str, Any]:
+    key = (
+        project_id,
+        chapter_id or "",
+        hashlib.sha1(str(text or "").encode("utf-8")).hexdigest(),
+        limit,
+        strict,
+    )
+    task = _entity_extract_inflight.get(key)
+    if task is None:
+        # 抽取跑在独立任务里，不绑定任何一个调用方：发起者被取消（如客户端断开）不会连带取消其他等待者
+        task = asyncio.create_task(
+            _run_extract_and_store_entity_candidates(
+                project_id=project_id,
+                chapter_id=chapter_id,
+                text=text,
+                limit=limit,
+                strict=strict,
+            )
+        )
+        _entity_extract_inflight[key] = task
+        task.add_done_callback(lambda done, key=key: _on_entity_extract_done(key, done))
+    return await asyncio.shield(task)
+
+
+async def _run_extract_and_store_entity_candidates(
+    *,
+    project_id: str,
+    chapter_id: Optional[str],
+    text: str,
+    limit: int,
+    strict: bool,
 ) -> dict[str, Any]:
     chapter_title, items = await _extract_entity_candidates_items(
         project_id=project_id,
@@ -1244,15 +1503,18 @@ async def _extract_and_store_entity_candidates(
         limit=limit,
         strict=strict,
     )
-    archived = _archive_previous_chapter_pending_candidates(
-        project_id=project_id,
-        chapter_id=chapter_id,
-    )
-    result = _persist_entity_candidates(
-        project_id=project_id,
-        chapter_id=chapter_id,
-        items=items,
-    )
+    async with _entity_persist_locks[str(project_id or "").strip()]:
+        archived = await asyncio.to_thread(
+            _archive_previous_chapter_pending_candidates,
+            project_id=project_id,
+            chapter_id=chapter_id,
+        )
+        result = await asyncio.to_thread(
+            _persist_entity_candidates,
+            project_id=project_id,
+            chapter_id=chapter_id,
+            items=items,
+        )
     result["chapter_title"] = chapter_title
     result["archived"] = archived
     return result
@@ -1359,6 +1621,15 @@ async def extract_entity_candidates_auto(req: EntityCandidateExtractRequest):
     }
 
 
+def _select_in(db, sql: str, params: tuple[Any, ...], values: list[Any], chunk: int = 500) -> list[Any]:
+    """执行带 IN ({}) 占位的查询；values 为空时不查库，超长时分批以避开 SQLite 参数上限。"""
+    rows: list[Any] = []
+    for start in range(0, len(values), chunk):
+        part = values[start:start + chunk]
+        rows.extend(db.execute(sql.format(",".join("?" * len(part))), (*params, *part)).fetchall())
+    return rows
+
+
 @router.post("/entity-candidates/commit")
 def commit_entity_candidates(req: EntityCandidateCommitRequest):
     project_id = str(req.project_id or "").strip()
@@ -1373,24 +1644,88 @@ def commit_entity_candidates(req: EntityCandidateCommitRequest):
     ignored = 0
     skipped = 0
     with get_db() as db:
+        # 整批操作在一个写事务内完成：读到的候选状态与随后的写入一致
+        db.execute("BEGIN IMMEDIATE")
         proj = db.execute("SELECT id FROM projects WHERE id = ?", (project_id,)).fetchone()
         if not proj:
             raise HTTPException(404, "项目不存在")
 
+        # 第一阶段：批量读取候选、同名已有条目与合并目标，循环内只做内存判断
+        candidate_ids = list(dict.fromkeys(
+            cid for cid in (str(op.candidate_id or "").strip() for op in operations) if cid
+        ))
+        candidates = {
+            r["id"]: dict(r)
+            for r in _select_in(
+                db,
+                "SELECT * FROM entity_candidates WHERE project_id = ? AND id IN ({})",
+                (project_id,),
+                candidate_ids,
+            )
+        }
+        create_names: dict[str, set[str]] = {"character": set(), "worldbuilding": set()}
+        merge_targets: dict[str, set[str]] = {"character": set(), "worldbuilding": set()}
+        for op in operations:
+            candidate = candidates.get(str(op.candidate_id or "").strip())
+            if not candidate:
+                continue
+            entity_type = str(candidate.get("entity_type") or "").strip()
+            if entity_type not in create_names:
+                continue
+            action = str(op.action or "create").strip().lower()
+            if action == "create":
+                create_names[entity_type].add(_clip(op.name or candidate.get("name", ""), 40))
+            elif action == "merge" and str(op.target_id or "").strip():
+                merge_targets[entity_type].add(str(op.target_id or "").strip())
+
+        # 键与 trim() + COLLATE NOCASE 一致（仅 ASCII 折叠）；同名多条时取最早插入的一条
+        existing_ids: dict[str, dict[str, str]] = {"character": {}, "worldbuilding": {}}
+        for entity_type, column, table in (
+            ("character", "name", "characters"),
+            ("worldbuilding", "title", "worldbuilding"),
+        ):
+            trimmed = f"trim({column}, {_SQL_TRIM_CHARS})"
+            sql = (
+                f"SELECT id, {trimmed} AS label FROM {table} "
+                f"WHERE project_id = ? AND {trimmed} COLLATE NOCASE IN ({{}}) ORDER BY rowid"
+            )
+            found = existing_ids[entity_type]
+            for r in _select_in(db, sql, (project_id,), list(create_names[entity_type])):
+                found.setdefault(str(r["label"]).translate(_SQL_LOWER), r["id"])
+        char_targets = {
+            r["id"]: dict(r)
+            for r in _select_in(
+                db,
+                "SELECT id, category, gender, age, identity FROM characters WHERE project_id = ? AND id IN ({})",
+                (project_id,),
+                list(merge_targets["character"]),
+            )
+        }
+        world_targets = {
+            r["id"]: dict(r)
+            for r in _select_in(
+                db,
+                "SELECT id, category, content FROM worldbuilding WHERE project_id = ? AND id IN ({})",
+                (project_id,),
+                list(merge_targets["worldbuilding"]),
+            )
+        }
+
+        # 第二阶段：按原顺序处理操作；候选状态与合并目标的变化先记在内存里
+        candidate_updates: list[tuple[str, str, str]] = []
+        ignored_ids: list[str] = []
+        touched_chars: dict[str, dict[str, Any]] = {}
+        touched_world: dict[str, dict[str, Any]] = {}
         for op in operations:
             candidate_id = str(op.candidate_id or "").strip()
             if not candidate_id:
                 skipped += 1
                 continue
-            row = db.execute(
-                "SELECT * FROM entity_candidates WHERE id = ? AND project_id = ? LIMIT 1",
-                (candidate_id, project_id),
-            ).fetchone()
-            if not row:
+            candidate = candidates.get(candidate_id)
+            if not candidate:
                 skipped += 1
                 continue
 
-            candidate = dict(row)
             action = str(op.action or "create").strip().lower()
             if action not in {"create", "merge", "ignore"}:
                 skipped += 1
@@ -1407,29 +1742,23 @@ def commit_entity_candidates(req: EntityCandidateCommitRequest):
             age = _normalize_age(op.age or candidate.get("age", ""))
 
             if action == "ignore":
-                db.execute(
-                    "UPDATE entity_candidates SET status = 'ignored', updated_at = datetime('now') WHERE id = ?",
-                    (candidate_id,),
-                )
+                ignored_ids.append(candidate_id)
+                candidate["status"] = "ignored"
                 ignored += 1
                 continue
 
             if action == "create":
                 if entity_type == "character":
-                    existed = db.execute(
-                        "SELECT id FROM characters WHERE project_id = ? AND lower(name) = lower(?) LIMIT 1",
-                        (project_id, name),
-                    ).fetchone()
-                    if existed:
-                        db.execute(
-                            "UPDATE entity_candidates SET status = 'merged', target_id = ?, updated_at = datetime('now') WHERE id = ?",
-                            (existed["id"], candidate_id),
-                        )
+                    name_key = name.translate(_SQL_LOWER)
+                    existed_id = existing_ids["character"].get(name_key)
+                    if existed_id:
+                        candidate_updates.append(("merged", existed_id, candidate_id))
+                        candidate["status"] = "merged"
                         merged += 1
                         continue
-                    db.execute(
+                    target = db.execute(
                         "INSERT INTO characters (project_id, name, category, gender, age, identity, personality, motivation, arc) "
-                        "VALUES (?,?,?,?,?,?,?,?,?)",
+                        "VALUES (?,?,?,?,?,?,?,?,?) RETURNING id",
                         (
                             project_id,
                             name,
@@ -1441,41 +1770,33 @@ def commit_entity_candidates(req: EntityCandidateCommitRequest):
                             "",
                             "",
                         ),
-                    )
-                    target = db.execute("SELECT id FROM characters WHERE rowid = last_insert_rowid()").fetchone()
+                    ).fetchone()
                     target_id = str(target["id"]) if target else ""
-                    db.execute(
-                        "UPDATE entity_candidates SET status = 'approved', target_id = ?, updated_at = datetime('now') WHERE id = ?",
-                        (target_id, candidate_id),
-                    )
+                    existing_ids["character"][name_key] = target_id
+                    candidate_updates.append(("approved", target_id, candidate_id))
+                    candidate["status"] = "approved"
                     created += 1
                 elif entity_type == "worldbuilding":
-                    existed = db.execute(
-                        "SELECT id FROM worldbuilding WHERE project_id = ? AND lower(title) = lower(?) LIMIT 1",
-                        (project_id, name),
-                    ).fetchone()
-                    if existed:
-                        db.execute(
-                            "UPDATE entity_candidates SET status = 'merged', target_id = ?, updated_at = datetime('now') WHERE id = ?",
-                            (existed["id"], candidate_id),
-                        )
+                    name_key = name.translate(_SQL_LOWER)
+                    existed_id = existing_ids["worldbuilding"].get(name_key)
+                    if existed_id:
+                        candidate_updates.append(("merged", existed_id, candidate_id))
+                        candidate["status"] = "merged"
                         merged += 1
                         continue
-                    db.execute(
-                        "INSERT INTO worldbuilding (project_id, category, title, content) VALUES (?,?,?,?)",
+                    target = db.execute(
+                        "INSERT INTO worldbuilding (project_id, category, title, content) VALUES (?,?,?,?) RETURNING id",
                         (
                             project_id,
                             _normalize_world_category(category),
                             name,
                             description,
                         ),
-                    )
-                    target = db.execute("SELECT id FROM worldbuilding WHERE rowid = last_insert_rowid()").fetchone()
+                    ).fetchone()
                     target_id = str(target["id"]) if target else ""
-                    db.execute(
-                        "UPDATE entity_candidates SET status = 'approved', target_id = ?, updated_at = datetime('now') WHERE id = ?",
-                        (target_id, candidate_id),
-                    )
+                    existing_ids["worldbuilding"][name_key] = target_id
+                    candidate_updates.append(("approved", target_id, candidate_id))
+                    candidate["status"] = "approved"
                     created += 1
                 else:
                     skipped += 1
@@ -1488,50 +1809,54 @@ def commit_entity_candidates(req: EntityCandidateCommitRequest):
                     continue
 
                 if entity_type == "character":
-                    target = db.execute(
-                        "SELECT id, category, gender, age, identity FROM characters "
-                        "WHERE id = ? AND project_id = ? LIMIT 1",
-                        (target_id, project_id),
-                    ).fetchone()
+                    target = char_targets.get(target_id)
                     if not target:
                         skipped += 1
                         continue
-                    merged_identity = _merge_text(target["identity"] or "", description, 240)
-                    merged_category = target["category"] or _normalize_char_category(category)
-                    merged_gender = target["gender"] or gender
-                    merged_age = target["age"] or (age if age else "未知")
-                    db.execute(
-                        "UPDATE characters SET category = ?, gender = ?, age = ?, identity = ? WHERE id = ?",
-                        (merged_category, merged_gender, merged_age, merged_identity, target_id),
-                    )
-                    db.execute(
-                        "UPDATE entity_candidates SET status = 'merged', target_id = ?, updated_at = datetime('now') WHERE id = ?",
-                        (target_id, candidate_id),
-                    )
+                    target["identity"] = _merge_text(target["identity"] or "", description, 240)
+                    target["category"] = target["category"] or _normalize_char_category(category)
+                    target["gender"] = target["gender"] or gender
+                    target["age"] = target["age"] or (age if age else "未知")
+                    touched_chars[target_id] = target
+                    candidate_updates.append(("merged", target_id, candidate_id))
+                    candidate["status"] = "merged"
                     merged += 1
                 elif entity_type == "worldbuilding":
-                    target = db.execute(
-                        "SELECT id, category, content FROM worldbuilding "
-                        "WHERE id = ? AND project_id = ? LIMIT 1",
-                        (target_id, project_id),
-                    ).fetchone()
+                    target = world_targets.get(target_id)
                     if not target:
                         skipped += 1
                         continue
-                    merged_content = _merge_text(target["content"] or "", description, 1800)
-                    merged_category = target["category"] or _normalize_world_category(category)
-                    db.execute(
-                        "UPDATE worldbuilding SET category = ?, content = ? WHERE id = ?",
-                        (merged_category, merged_content, target_id),
-                    )
-                    db.execute(
-                        "UPDATE entity_candidates SET status = 'merged', target_id = ?, updated_at = datetime('now') WHERE id = ?",
-                        (target_id, candidate_id),
-                    )
+                    target["content"] = _merge_text(target["content"] or "", description, 1800)
+                    target["category"] = target["category"] or _normalize_world_category(category)
+                    touched_world[target_id] = target
+                    candidate_updates.append(("merged", target_id, candidate_id))
+                    candidate["status"] = "merged"
                     merged += 1
                 else:
                     skipped += 1
 
+        # 第三阶段：合并结果与候选状态分组批量写回
+        if touched_chars:
+            db.executemany(
+                "UPDATE characters SET category = ?, gender = ?, age = ?, identity = ? WHERE id = ?",
+                [(t["category"], t["gender"], t["age"], t["identity"], tid) for tid, t in touched_chars.items()],
+            )
+        if touched_world:
+            db.executemany(
+                "UPDATE worldbuilding SET category = ?, content = ? WHERE id = ?",
+                [(t["category"], t["content"], tid) for tid, t in touched_world.items()],
+            )
+        if ignored_ids:
+            db.executemany(
+                "UPDATE entity_candidates SET status = 'ignored', updated_at = datetime('now') WHERE id = ?",
+                [(cid,) for cid in ignored_ids],
+            )
+        if candidate_updates:
+            db.executemany(
+                "UPDATE entity_candidates SET status = ?, target_id = ?, updated_at = datetime('now') WHERE id = ?",
+                candidate_updates,
+            )
+
     return {"created": created, "merged": merged, "ignored": ignored, "skipped": skipped}
 
 
@@ -1553,7 +1878,9 @@ async def ai_trace_preview(req: AITracePreviewRequest):
 
     if chapter_id:
         try:
-            chapter_title, chapter_source_text = _load_chapter_extract_text(project_id, chapter_id)
+            chapter_title, chapter_source_text = await asyncio.to_thread(
+                _load_chapter_extract_text, project_id, chapter_id, 24000
+            )
             if not str(source_text).strip():
                 source_text = chapter_source_text
         except HTTPException:
@@ -1565,9 +1892,12 @@ async def ai_trace_preview(req: AITracePreviewRequest):
 
     # 保持原始字符偏移，避免 _clip 的 strip/省略号改变命中索引。
     text_for_check = str(source_text)[:24000]
-    detected_hits = _detect_ai_trace_hits(text_for_check, strictness, req.max_hits)
+    # 规则扫描是纯 CPU 工作，放到线程里跑，长章节不阻塞事件循环
+    detected_hits = await asyncio.to_thread(_detect_ai_trace_hits, text_for_check, strictness, req.max_hits)
     score, level = _calc_ai_trace_score(detected_hits, len(text_for_check), strictness)
     summary = _summarize_ai_trace(detected_hits, score, level)
+    if _ai_trace_scan_limit(len(text_for_check), strictness) < len(text_for_check):
+        summary += f"（低严格度仅扫描前 {AI_TRACE_LOW_SCAN_LIMIT} 字）"
 
     return AITracePreviewResponse(
         chapter_id=chapter_id,
@@ -1612,19 +1942,27 @@ def _normalize_token_limit(value: Any, default_value: int) -> int:
     return max(256, min(12000, parsed))
 
 
-def _load_reviewer_runtime(project_id: str) -> tuple[str, float, int, str, bool]:
+_reviewer_runtime_cache = TTLCache(maxsize=512, ttl=60.0)
+
+
+def _load_reviewer_runtime(project_id: str, db=None) -> tuple[str, float, int, str, bool]:
+    cached = _reviewer_runtime_cache.get(project_id)
+    if cached is not None:
+        return cached
     default_model = "claude-sonnet-4"
     default_temp = 0.3
     default_max_tokens = 2200
-    with get_db() as db:
-        row = db.execute(
-            "SELECT p.model_main, ac.model AS cfg_model, ac.temperature AS cfg_temp, "
-            "ac.max_tokens AS cfg_max_tokens, ac.system_prompt AS cfg_prompt, ac.enabled AS cfg_enabled "
-            "FROM projects p "
-            "LEFT JOIN agent_configs ac ON ac.project_id = p.id AND ac.agent_type = 'reviewer' "
-            "WHERE p.id = ?",
-            (project_id,),
-        ).fetchone()
+    if db is None:
+        with get_db() as db:
+            return _load_reviewer_runtime(project_id, db)
+    row = db.execute(
+        "SELECT p.model_main, ac.model AS cfg_model, ac.temperature AS cfg_temp, "
+        "ac.max_tokens AS cfg_max_tokens, ac.system_prompt AS cfg_prompt, ac.enabled AS cfg_enabled "
+        "FROM projects p "
+        "LEFT JOIN agent_configs ac ON ac.project_id = p.id AND ac.agent_type = 'reviewer' "
+        "WHERE p.id = ?",
+        (project_id,),
+    ).fetchone()
     if not row:
         raise HTTPException(404, "项目不存在")
 
@@ -1644,21 +1982,25 @@ def _load_reviewer_runtime(project_id: str) -> tuple[str, float, int, str, bool]
     enabled_raw = row["cfg_enabled"]
     enabled = bool(enabled_raw) if enabled_raw is not None else True
     system_prompt = prompt_override or REVIEWER_SYSTEM_PROMPT
-    return model, temperature, max_tokens, system_prompt, enabled
-
-
-def _load_single_chapter_review_material(project_id: str, chapter_id: str) -> tuple[str, str, str]:
-    with get_db() as db:
-        chapter = db.execute(
-            "SELECT id, chapter_num, title, synopsis, phase FROM chapters WHERE id = ? AND project_id = ?",
-            (chapter_id, project_id),
-        ).fetchone()
-        if not chapter:
-            raise HTTPException(404, "章节不存在")
-        paras = db.execute(
-            "SELECT content FROM chapter_paragraphs WHERE chapter_id = ? ORDER BY para_index ASC LIMIT 500",
-            (chapter_id,),
-        ).fetchall()
+    runtime = (model, temperature, max_tokens, system_prompt, enabled)
+    _reviewer_runtime_cache.set(project_id, runtime)
+    return runtime
+
+
+def _load_single_chapter_review_material(project_id: str, chapter_id: str, db=None) -> tuple[str, str, str]:
+    if db is None:
+        with get_db() as db:
+            return _load_single_chapter_review_material(project_id, chapter_id, db)
+    chapter = db.execute(
+        "SELECT id, chapter_num, title, synopsis, phase FROM chapters WHERE id = ? AND project_id = ?",
+        (chapter_id, project_id),
+    ).fetchone()
+    if not chapter:
+        raise HTTPException(404, "章节不存在")
+    paras = db.execute(
+        "SELECT content FROM chapter_paragraphs WHERE chapter_id = ? ORDER BY para_index ASC LIMIT 500",
+        (chapter_id,),
+    ).fetchall()
 
     chapter_title = f"第{chapter['chapter_num']}章《{chapter['title'] or '未命名'}》"
     chapter_text = "\n\n".join(
@@ -1680,121 +2022,169 @@ def _load_single_chapter_review_material(project_id: str, chapter_id: str) -> tu
     return chapter_id, chapter_title, "\n".join(material).strip()
 
 
-def _load_project_review_material(project_id: str) -> tuple[None, str, str]:
-    with get_db() as db:
-        project = db.execute(
-            "SELECT name, genre, description FROM projects WHERE id = ?",
-            (project_id,),
-        ).fetchone()
-        if not project:
-            raise HTTPException(404, "项目不存在")
-
-        outlines = db.execute(
-            "SELECT phase, title, content FROM outlines WHERE project_id = ? ORDER BY phase_order ASC, created_at ASC LIMIT 16",
-            (project_id,),
-        ).fetchall()
-        characters = db.execute(
-            "SELECT name, category, identity, personality FROM characters WHERE project_id = ? ORDER BY sort_order ASC, created_at ASC LIMIT 24",
-            (project_id,),
-        ).fetchall()
-        world_items = db.execute(
-            "SELECT title, category, content FROM worldbuilding WHERE project_id = ? ORDER BY sort_order ASC, created_at ASC LIMIT 24",
-            (project_id,),
-        ).fetchall()
-        chapters = db.execute(
-            "SELECT id, chapter_num, title, synopsis FROM chapters WHERE project_id = ? ORDER BY chapter_num ASC, sort_order ASC LIMIT 120",
-            (project_id,),
-        ).fetchall()
+def _load_project_review_material(project_id: str, db=None) -> tuple[None, str, str]:
+    if db is None:
+        with get_db() as db:
+            return _load_project_review_material(project_id, db)
+    project = db.execute(
+        "SELECT name, genre, description FROM projects WHERE id = ?",
+        (project_id,),
+    ).fetchone()
+    if not project:
+        raise HTTPException(404, "项目不存在")
 
-        chapter_blocks: list[str] = []
-        for ch in chapters:
-            snippets = db.execute(
-                "SELECT content FROM chapter_paragraphs WHERE chapter_id = ? ORDER BY para_index ASC LIMIT 3",
-                (str(ch["id"]),),
-            ).fetchall()
-            snippet_text = " ".join(
-                [str(p["content"] or "").strip() for p in snippets if str(p["content"] or "").strip()]
-            ).strip()
-            synopsis = str(ch["synopsis"] or "").strip()
-            block = (
-                f"- 第{ch['chapter_num']}章《{ch['title'] or '未命名'}》"
-                f" | 梗概:{_clip(synopsis, 120) or '无'}"
-                f" | 正文片段:{_clip(snippet_text, 180) or '无'}"
-            )
-            chapter_blocks.append(block)
+    outlines = db.execute(
+        "SELECT phase, title, content FROM outlines WHERE project_id = ? ORDER BY phase_order ASC, created_at ASC LIMIT 16",
+        (project_id,),
+    ).fetchall()
+    characters = db.execute(
+        "SELECT name, category, identity, personality FROM characters WHERE project_id = ? ORDER BY sort_order ASC, created_at ASC LIMIT 24",
+        (project_id,),
+    ).fetchall()
+    world_items = db.execute(
+        "SELECT title, category, content FROM worldbuilding WHERE project_id = ? ORDER BY sort_order ASC, created_at ASC LIMIT 24",
+        (project_id,),
+    ).fetchall()
+    chapters = db.execute(
+        "SELECT id, chapter_num, title, synopsis FROM chapters WHERE project_id = ? ORDER BY chapter_num ASC, sort_order ASC LIMIT 120",
+        (project_id,),
+    ).fetchall()
+
+    # 各章前 3 段一次取回（窗口函数），代替逐章查询
+    snippets_by_id: dict[str, list[str]] = {}
+    if chapters:
+        chapter_ids = [str(ch["id"]) for ch in chapters]
+        for p in db.execute(
+            "SELECT chapter_id, content FROM ("
+            "SELECT chapter_id, content, para_index, "
+            "ROW_NUMBER() OVER (PARTITION BY chapter_id ORDER BY para_index ASC) AS rn "
+            f"FROM chapter_paragraphs WHERE chapter_id IN ({','.join('?' * len(chapter_ids))})"
+            ") WHERE rn <= 3 ORDER BY chapter_id, rn",
+            chapter_ids,
+        ):
+            snippets_by_id.setdefault(p["chapter_id"], []).append(p["content"])
+
+    chapter_blocks: list[str] = []
+    for ch in chapters:
+        snippets = snippets_by_id.get(str(ch["id"]), [])
+        snippet_text = " ".join(
+            [str(p or "").strip() for p in snippets if str(p or "").strip()]
+        ).strip()
+        synopsis = str(ch["synopsis"] or "").strip()
+        block = (
+            f"- 第{ch['chapter_num']}章《{ch['title'] or '未命名'}》"
+            f" | 梗概:{_clip(synopsis, 120) or '无'}"
+            f" | 正文片段:{_clip(snippet_text, 180) or '无'}"
+        )
+        chapter_blocks.append(block)
 
+    # 所有行平铺进同一个列表，最后只做一次 join
     material_parts: list[str] = [
         f"【项目】{project['name']}（题材：{str(project['genre'] or '').strip() or '未标注'}）",
-        f"【项目简介】{_clip(str(project['description'] or '').strip(), 420) or '无'}",
+        f"【项目简介】{_clip(project['description'], 420) or '无'}",
     ]
 
     if characters:
         char_lines = [
             f"- {c['name']}（{str(c['category'] or '').strip() or '未分类'}）"
-            f" | 身份:{_clip(str(c['identity'] or '').strip(), 80) or '无'}"
-            f" | 性格:{_clip(str(c['personality'] or '').strip(), 60) or '无'}"
+            f" | 身份:{_clip(c['identity'], 80) or '无'}"
+            f" | 性格:{_clip(c['personality'], 60) or '无'}"
             for c in characters
         ]
-        material_parts.extend(["", "【角色摘要】", "\n".join(char_lines)])
+        material_parts.extend(["", "【角色摘要】"])
+        material_parts.extend(char_lines)
 
     if world_items:
         world_lines = [
-            f"- {w['title']}（{str(w['category'] or '').strip() or '其他'}）：{_clip(str(w['content'] or '').strip(), 100) or '无'}"
+            f"- {w['title']}（{str(w['category'] or '').strip() or '其他'}）：{_clip(w['content'], 100) or '无'}"
             for w in world_items
         ]
-        material_parts.extend(["", "【世界观摘要】", "\n".join(world_lines)])
+        material_parts.extend(["", "【世界观摘要】"])
+        material_parts.extend(world_lines)
 
     if outlines:
         outline_lines = [
-            f"- [{str(o['phase'] or '').strip() or '未标注'}] {str(o['title'] or '').strip() or '未命名'}：{_clip(str(o['content'] or '').strip(), 120) or '无'}"
+            f"- [{str(o['phase'] or '').strip() or '未标注'}] {str(o['title'] or '').strip() or '未命名'}：{_clip(o['content'], 120) or '无'}"
             for o in outlines
         ]
-        material_parts.extend(["", "【大纲摘要】", "\n".join(outline_lines)])
+        material_parts.extend(["", "【大纲摘要】"])
+        material_parts.extend(outline_lines)
 
-    if chapter_blocks:
-        material_parts.extend(["", "【章节序列摘要】", "\n".join(chapter_blocks)])
-    else:
-        material_parts.extend(["", "【章节序列摘要】", "- 暂无章节内容"])
+    material_parts.extend(["", "【章节序列摘要】"])
+    material_parts.extend(chapter_blocks or ["- 暂无章节内容"])
 
     project_title = f"{project['name']}（全书）"
-    return None, project_title, _clip("\n".join(material_parts).strip(), 22000)
+    return None, project_title, _clip("\n".join(material_parts), 22000)
+
+
+# 空白已先折叠成单个空格，行首编号只剩这些字符；非 ASCII 数字由 isdecimal 兜底
+_REVIEW_BULLET_CHARS = "-*.)(、 0123456789"
+_REVIEW_SKIP_LINE_RE = re.compile(r"(总评|评分|结论|总结|建议结构|输出要求)")
+_REVIEW_ISSUE_LINE_RE = re.compile(r"(问题|冲突|不一致|矛盾|薄弱|突兀|跳跃|混乱|缺失|建议|需要|不足)")
+_REVIEW_SENT_ENDS = "。！？；;"
+
+
+# 同时命中多个分类时取排在前面的一个；维度默认 logic，严重度默认 中
+_REVIEW_DIMENSION_KEYWORDS: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("consistency", ("consistency", "一致", "连贯", "主线")),
+    ("character", ("character", "人物", "角色")),
+    ("pacing", ("pacing", "节奏", "推进")),
+    ("logic", ("logic", "逻辑", "因果")),
+)
+_REVIEW_SEVERITY_KEYWORDS: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("高", ("高", "high", "严重", "fatal")),
+    ("低", ("低", "low", "轻微")),
+)
+
+
+def _build_review_keyword_automaton() -> ahocorasick.Automaton:
+    automaton = ahocorasick.Automaton()
+    for kind, groups in enumerate((_REVIEW_SEVERITY_KEYWORDS, _REVIEW_DIMENSION_KEYWORDS)):
+        for rank, (value, words) in enumerate(groups):
+            for word in words:
+                automaton.add_word(word, (kind, rank, value))
+    automaton.make_automaton()
+    return automaton
+
+
+_REVIEW_KEYWORD_AUTOMATON = _build_review_keyword_automaton()
+
+
+def _classify_review_text(raw: Any) -> tuple[str, str]:
+    """单遍扫描同时得出 (严重度, 维度)。"""
+    values = ["中", "logic"]
+    ranks = [len(_REVIEW_SEVERITY_KEYWORDS), len(_REVIEW_DIMENSION_KEYWORDS)]
+    for _, (kind, rank, value) in _REVIEW_KEYWORD_AUTOMATON.iter(str(raw or "").lower()):
+        if rank < ranks[kind]:
+            ranks[kind] = rank
+            values[kind] = value
+            if ranks[0] == 0 and ranks[1] == 0:
+                break
+    return values[0], values[1]
 
 
 def _normalize_review_dimension(raw: Any) -> str:
-    text = str(raw or "").strip().lower()
-    if any(k in text for k in ("consistency", "一致", "连贯", "主线")):
-        return "consistency"
-    if any(k in text for k in ("character", "人物", "角色")):
-        return "character"
-    if any(k in text for k in ("pacing", "节奏", "推进")):
-        return "pacing"
-    if any(k in text for k in ("logic", "逻辑", "因果")):
-        return "logic"
-    return "logic"
+    return _classify_review_text(raw)[1]
 
 
 def _normalize_review_severity(raw: Any) -> str:
-    text = str(raw or "").strip().lower()
-    if any(k in text for k in ("高", "high", "严重", "fatal")):
-        return "高"
-    if any(k in text for k in ("低", "low", "轻微")):
-        return "低"
-    return "中"
+    return _classify_review_text(raw)[0]
 
 
 def _normalize_issue_text(raw: Any) -> str:
-    text = str(raw or "").strip()
-    text = re.sub(r"\s+", " ", text)
-    text = re.sub(r"^[\-\*\d\.\)\(、\s]+", "", text)
+    text = " ".join(str(raw or "").split()).lstrip(_REVIEW_BULLET_CHARS)
+    while text and text[0].isdecimal():
+        text = text[1:].lstrip(_REVIEW_BULLET_CHARS)
     return _clip(text, 260)
 
 
 def _normalize_review_issues(raw_issues: Any, raw_review: str) -> list[dict[str, Any]]:
     normalized: list[dict[str, Any]] = []
-    seen: set[str] = set()
+    seen: set[tuple[str, str, str]] = set()
 
     if isinstance(raw_issues, list):
-        for item in raw_issues:
+        # 最多保留 16 条，最多看前 64 条，避免异常长的数组拖慢归一化
+        for item in islice(raw_issues, 64):
             if isinstance(item, dict):
                 text = _normalize_issue_text(
                     item.get("text")
@@ -1811,35 +2201,33 @@ def _normalize_review_issues(raw_issues: Any, raw_review: str) -> list[dict[str,
                 text = _normalize_issue_text(item)
                 if not text:
                     continue
-                severity = _normalize_review_severity(text)
-                dimension = _normalize_review_dimension(text)
+                severity, dimension = _classify_review_text(text)
 
-            key = f"{dimension}:{severity}:{text}"
+            key = (dimension, severity, text)
             if key in seen:
                 continue
             seen.add(key)
             normalized.append({"text": text, "severity": severity, "dimension": dimension})
             if len(normalized) >= 16:
-                break
-
-    if normalized:
-        return normalized
+                return normalized
+        # 结构化问题列表有效时直接返回；全部无效才退回逐行扫描原文
+        if normalized:
+            return normalized
 
     lines = [
-        _normalize_issue_text(line)
+        cleaned
         for line in str(raw_review or "").replace("\r\n", "\n").split("\n")
-        if _normalize_issue_text(line)
+        if (cleaned := _normalize_issue_text(line))
     ]
     for line in lines:
         if len(line) < 10:
             continue
-        if re.search(r"(总评|评分|结论|总结|建议结构|输出要求)", line):
+        if _REVIEW_SKIP_LINE_RE.search(line):
             continue
-        if not re.search(r"(问题|冲突|不一致|矛盾|薄弱|突兀|跳跃|混乱|缺失|建议|需要|不足)", line):
+        if not _REVIEW_ISSUE_LINE_RE.search(line):
             continue
-        severity = _normalize_review_severity(line)
-        dimension = _normalize_review_dimension(line)
-        key = f"{dimension}:{severity}:{line}"
+        severity, dimension = _classify_review_text(line)
+        key = (dimension, severity, line)
         if key in seen:
             continue
         seen.add(key)
@@ -1849,30 +2237,76 @@ def _normalize_review_issues(raw_issues: Any, raw_review: str) -> list[dict[str,
     return normalized
 
 
-def _extract_score_from_text(raw_review: str, aliases: list[str]) -> Optional[int]:
-    for alias in aliases:
-        pattern = rf"{re.escape(alias)}\s*[：:]\s*(\d{{1,3}})"
-        match = re.search(pattern, raw_review, re.IGNORECASE)
-        if match:
-            try:
-                return int(match.group(1))
-            except Exception:
-                continue
-    return None
+# 各维度的评分别名按优先级排列
+_REVIEW_SCORE_ALIASES: dict[str, tuple[str, ...]] = {
+    "consistency": ("内容一致性", "一致性", "主线一致性", "consistency"),
+    "character": ("人物塑造", "角色塑造", "角色一致性", "character"),
+    "pacing": ("叙事节奏", "节奏", "推进节奏", "pacing"),
+    "logic": ("角色逻辑", "逻辑", "因果逻辑", "logic"),
+}
+
+
+def _compile_review_score_pattern() -> tuple[re.Pattern[str], dict[str, tuple[tuple[str, int], ...]]]:
+    """全部别名合成一个正则，每个分支用独立命名组捕获分数，命中后由 lastgroup 反查别名。
+
+    单遍扫描中较长别名会吞掉以它结尾的较短别名（如“角色一致性”里的“一致性”），
+    所以每个分支同时记下这些后缀别名，保持与逐个别名 search 相同的结果。
+    """
+    aliases = [(alias, dim, rank) for dim, words in _REVIEW_SCORE_ALIASES.items() for rank, alias in enumerate(words)]
+    branches: list[str] = []
+    owners: dict[str, tuple[tuple[str, int], ...]] = {}
+    for idx, (alias, _, _) in sorted(enumerate(aliases), key=lambda it: -len(it[1][0])):
+        group = f"s{idx}"
+        branches.append(rf"{re.escape(alias)}\s*[：:]\s*(?P<{group}>\d{{1,3}})")
+        owners[group] = tuple(
+            (dim, rank) for other, dim, rank in aliases if alias.casefold().endswith(other.casefold())
+        )
+    return re.compile("|".join(branches), re.IGNORECASE), owners
+
+
+_REVIEW_SCORE_RE, _REVIEW_SCORE_GROUP_OWNERS = _compile_review_score_pattern()
+
+
+def _extract_scores_from_text(raw_review: str) -> dict[str, int]:
+    """每个维度取优先级最高的别名首次出现处的分数。"""
+    best: dict[str, tuple[int, int]] = {}
+    for match in _REVIEW_SCORE_RE.finditer(raw_review):
+        group = match.lastgroup
+        value = int(match.group(group))
+        for dim, rank in _REVIEW_SCORE_GROUP_OWNERS[group]:
+            current = best.get(dim)
+            if current is None or rank < current[0]:
+                best[dim] = (rank, value)
+    return {dim: value for dim, (_, value) in best.items()}
 
 
 def _clamp_score(value: Any) -> int:
-    try:
-        score = int(round(float(value)))
-    except Exception:
-        score = 0
+    # 模型通常直接给出数字，先走数值分支；字符串等再走通用转换
+    if isinstance(value, float):
+        try:
+            score = round(value)
+        except (OverflowError, ValueError):
+            score = 0
+    elif isinstance(value, int):
+        score = int(value)
+    else:
+        try:
+            score = int(round(float(value)))
+        except Exception:
+            score = 0
     return max(0, min(100, score))
 
 
 def _build_score_fallback(issues: list[dict[str, Any]]) -> dict[str, int]:
-    high = sum(1 for item in issues if str(item.get("severity")) == "高")
-    medium = sum(1 for item in issues if str(item.get("severity")) == "中")
-    low = sum(1 for item in issues if str(item.get("severity")) == "低")
+    high = medium = low = 0
+    for item in issues:
+        severity = item.get("severity")
+        if severity == "高":
+            high += 1
+        elif severity == "中":
+            medium += 1
+        elif severity == "低":
+            low += 1
     base = 84 - high * 16 - medium * 8 - low * 4
     base = max(22, min(94, base))
     return {
@@ -1890,18 +2324,12 @@ def _normalize_review_scores(raw_scores: Any, issues: list[dict[str, Any]], raw_
             dim = _normalize_review_dimension(key)
             normalized[dim] = _clamp_score(value)
 
-    aliases = {
-        "consistency": ["内容一致性", "一致性", "主线一致性", "consistency"],
-        "character": ["人物塑造", "角色塑造", "角色一致性", "character"],
-        "pacing": ["叙事节奏", "节奏", "推进节奏", "pacing"],
-        "logic": ["角色逻辑", "逻辑", "因果逻辑", "logic"],
-    }
-    for dim, words in aliases.items():
-        if dim in normalized and normalized[dim] > 0:
-            continue
-        parsed = _extract_score_from_text(raw_review, words)
-        if parsed is not None:
-            normalized[dim] = _clamp_score(parsed)
+    missing = [dim for dim in _REVIEW_SCORE_ALIASES if normalized.get(dim, 0) <= 0]
+    if missing:
+        parsed = _extract_scores_from_text(raw_review)
+        for dim in missing:
+            if dim in parsed:
+                normalized[dim] = _clamp_score(parsed[dim])
 
     fallback = _build_score_fallback(issues)
     for dim in ("consistency", "character", "pacing", "logic"):
@@ -1916,18 +2344,19 @@ def _normalize_review_scores(raw_scores: Any, issues: list[dict[str, Any]], raw_
 def _normalize_review_summary(raw_summary: Any, raw_review: str) -> str:
     summary = str(raw_summary or "").strip()
     if summary.startswith("```"):
-        summary = re.sub(r"^```(?:json)?\s*", "", summary)
-        summary = re.sub(r"\s*```$", "", summary)
-        summary = summary.strip()
+        summary = strip_fence(summary)
 
     if not summary:
         summary = str(raw_review or "").strip()
-    summary = re.sub(r"\r\n", "\n", summary)
-    summary = re.sub(r"\n{3,}", "\n\n", summary)
+    summary = summary.replace("\r\n", "\n")
+    # 连续 3 个以上换行压成 2 个；绝大多数摘要一次 in 检查即可跳过
+    while "\n\n\n" in summary:
+        summary = summary.replace("\n\n\n", "\n\n")
 
     if summary and "\n" not in summary and len(summary) > 220:
-        summary = re.sub(r"([。！？；;])", r"\1\n", summary)
-        summary = re.sub(r"\n{3,}", "\n\n", summary)
+        # 逐个终止符做 str.replace，比带捕获组的正则替换快一个数量级
+        for ch in _REVIEW_SENT_ENDS:
+            summary = summary.replace(ch, ch + "\n")
     return _clip(summary.strip(), 1800)
 
 
@@ -1954,51 +2383,47 @@ def _build_review_filters(
     return " AND ".join(clauses), params
 
 
-@router.post("/reviews/run")
-async def run_review(req: ReviewRunRequest):
-    project_id = str(req.project_id or "").strip()
-    if not project_id:
-        raise HTTPException(400, "project_id 不能为空")
-
-    scope = str(req.scope or "project").strip().lower()
-    if scope not in {"project", "chapter"}:
-        raise HTTPException(400, "scope 仅支持 project/chapter")
-    chapter_id = str(req.chapter_id or "").strip() or None
-    if scope == "chapter" and not chapter_id:
-        raise HTTPException(400, "chapter 范围必须提供 chapter_id")
-
-    model, temperature, max_tokens, system_prompt, enabled = _load_reviewer_runtime(project_id)
-    if not enabled:
-        raise HTTPException(400, "审核编辑已在项目设置中禁用")
+def _load_review_run_inputs(
+    project_id: str,
+    scope: str,
+    chapter_id: Optional[str],
+) -> tuple[tuple[str, float, int, str], tuple[Optional[str], str, str]]:
+    """审阅前的配置与材料读取共用一个连接。"""
+    with get_db() as db:
+        model, temperature, max_tokens, system_prompt, enabled = _load_reviewer_runtime(project_id, db)
+        if not enabled:
+            raise HTTPException(400, "审核编辑已在项目设置中禁用")
+        if scope == "chapter":
+            material = _load_single_chapter_review_material(project_id, chapter_id or "", db)
+        else:
+            material = _load_project_review_material(project_id, db)
+    return (model, temperature, max_tokens, system_prompt), material
 
-    if scope == "chapter":
-        resolved_chapter_id, scope_title, material_text = _load_single_chapter_review_material(project_id, chapter_id or "")
-    else:
-        resolved_chapter_id, scope_title, material_text = _load_project_review_material(project_id)
 
-    prompt = f"""
-你是连载小说审校主编。请根据给定材料进行审阅，返回严格 JSON。
+# 审阅提示词的固定部分在模块加载时定好，请求时只拼接范围标题与材料
+_REVIEW_PROMPT_HEAD = """你是连载小说审校主编。请根据给定材料进行审阅，返回严格 JSON。
 
-目标范围：{scope_title}
+目标范围："""
+_REVIEW_PROMPT_MID = """
 审阅维度：内容一致性、人物塑造、叙事节奏、角色逻辑。
 
 输出格式（必须严格遵守）：
-{{
-  "scores": {{
+{
+  "scores": {
     "consistency": 0-100,
     "character": 0-100,
     "pacing": 0-100,
     "logic": 0-100
-  }},
+  },
   "issues": [
-    {{
+    {
       "text": "问题描述（可执行）",
       "severity": "高|中|低",
       "dimension": "consistency|character|pacing|logic"
-    }}
+    }
   ],
   "summary": "分段总结，包含总体判断与改稿优先级。"
-}}
+}
 
 要求：
 1) 若无明显问题，issues 可为空数组；
@@ -2006,8 +2431,27 @@ async def run_review(req: ReviewRunRequest):
 3) 仅输出 JSON，不要 Markdown，不要额外解释。
 
 【审阅材料】
-{material_text}
-""".strip()
+"""
+
+
+@router.post("/reviews/run")
+async def run_review(req: ReviewRunRequest):
+    project_id = str(req.project_id or "").strip()
+    if not project_id:
+        raise HTTPException(400, "project_id 不能为空")
+
+    scope = str(req.scope or "project").strip().lower()
+    if scope not in {"project", "chapter"}:
+        raise HTTPException(400, "scope 仅支持 project/chapter")
+    chapter_id = str(req.chapter_id or "").strip() or None
+    if scope == "chapter" and not chapter_id:
+        raise HTTPException(400, "chapter 范围必须提供 chapter_id")
+
+    runtime, material = await asyncio.to_thread(_load_review_run_inputs, project_id, scope, chapter_id)
+    model, temperature, max_tokens, system_prompt = runtime
+    resolved_chapter_id, scope_title, material_text = material
+
+    prompt = f"{_REVIEW_PROMPT_HEAD}{scope_title}{_REVIEW_PROMPT_MID}{material_text}"
 
     agent_router._init_services()
     llm = agent_router._llm
@@ -2030,19 +2474,15 @@ async def run_review(req: ReviewRunRequest):
     summary = _normalize_review_summary(payload.get("summary"), raw_review)
 
     with get_db() as db:
-        db.execute(
-            "INSERT INTO reviews (project_id, chapter_id, scores, issues, summary) VALUES (?,?,?,?,?)",
+        row = db.execute(
+            "INSERT INTO reviews (project_id, chapter_id, scores, issues, summary) VALUES (?,?,?,?,?) RETURNING *",
             (
                 project_id,
                 resolved_chapter_id if scope == "chapter" else None,
-                json.dumps(scores, ensure_ascii=False),
-                json.dumps(issues, ensure_ascii=False),
+                orjson.dumps(scores).decode(),
+                orjson.dumps(issues).decode(),
                 summary,
             ),
-        )
-        row = db.execute(
-            "SELECT * FROM reviews WHERE project_id = ? ORDER BY created_at DESC LIMIT 1",
-            (project_id,),
         ).fetchone()
 
     result = dict(row) if row else {}
@@ -2059,6 +2499,18 @@ async def run_review(req: ReviewRunRequest):
     }
 
 
+def _decode_review_row(row: sqlite3.Row) -> dict[str, Any]:
+    """scores / issues 列在库中存 JSON 文本，出库时解码一次，接口统一返回结构化数据。"""
+    result = dict(row)
+    for key, default in (("scores", {}), ("issues", [])):
+        raw = result.get(key)
+        try:
+            result[key] = orjson.loads(raw) if raw else default
+        except orjson.JSONDecodeError:
+            result[key] = default
+    return result
+
+
 @router.get("/reviews")
 def list_reviews(project_id: str, scope: str = "", chapter_id: str = ""):
     where_sql, params = _build_review_filters(project_id, scope, chapter_id)
@@ -2067,7 +2519,7 @@ def list_reviews(project_id: str, scope: str = "", chapter_id: str = ""):
             f"SELECT * FROM reviews WHERE {where_sql} ORDER BY created_at DESC",
             params,
         ).fetchall()
-        return [dict(r) for r in rows]
+        return [_decode_review_row(r) for r in rows]
 
 
 @router.get("/reviews/latest")
@@ -2080,14 +2532,14 @@ def get_latest_review(project_id: str, scope: str = "", chapter_id: str = ""):
         ).fetchone()
         if not row:
             return None
-        return dict(row)
+        return _decode_review_row(row)
 
 
 @router.post("/reviews")
 def create_review(data: dict):
     with get_db() as db:
-        db.execute(
-            "INSERT INTO reviews (project_id, chapter_id, scores, issues, summary) VALUES (?,?,?,?,?)",
+        row = db.execute(
+            "INSERT INTO reviews (project_id, chapter_id, scores, issues, summary) VALUES (?,?,?,?,?) RETURNING *",
             (
                 data["project_id"],
                 data.get("chapter_id"),
@@ -2095,9 +2547,5 @@ def create_review(data: dict):
                 json.dumps(data.get("issues", []), ensure_ascii=False),
                 data.get("summary", ""),
             ),
-        )
-        row = db.execute(
-            "SELECT * FROM reviews WHERE project_id = ? ORDER BY created_at DESC LIMIT 1",
-            (data["project_id"],),
         ).fetchone()
-        return dict(row)
+        return _decode_review_row(row)
@@ -1,5 +1,5 @@
 import asyncio
-import json
+import orjson
 from fastapi import APIRouter
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
@@ -7,6 +7,7 @@ from typing import Optional
 
 from db import get_db
 from agents import router as agent_router
+from api._runtime_cache import TTLCache
 from agents.default_prompts import (
     DEBATE_ROOM_SYSTEM_PROMPT,
     DEBATE_ROOM_ROLE_PROMPTS,
@@ -19,6 +20,38 @@ DEFAULT_MODEL = "claude-sonnet-4"
 DEFAULT_TEMPERATURE = 0.7
 DEFAULT_MAX_TOKENS = 600
 
+# (agent_id, 显示名, 默认职责)；按此顺序向前端输出
+_DEBATE_ROLES: tuple[tuple[str, str, str], ...] = (
+    ("reader", "挑剔的读者", "聚焦读者体验、雷点与爽点。"),
+    ("villain", "反派主脑", "聚焦反派策略、压迫升级与代价。"),
+    ("architect", "世界观架构师", "聚焦设定一致性、规则边界与伏笔回收。"),
+)
+_ROLE_OUTPUT_REQ = "输出要求：100-200字；先指出关键问题，再给可执行改法；不说套话。"
+_DIRECTOR_TASK = "请基于三位意见输出最终【剧情落地方案】。"
+_STREAM_END = object()
+
+
+def _sse(payload: dict) -> bytes:
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+# token 事件外壳按角色预先编码，逐 token 只序列化文本本身
+_TOKEN_PREFIX = {
+    agent_id: b'data: {"event":"token","agent":' + orjson.dumps(agent_id) + b',"text":'
+    for agent_id in (*(role[0] for role in _DEBATE_ROLES), "director")
+}
+_TOKEN_SUFFIX = b"}\n\n"
+
+
+async def _pump_to_queue(agen, queue: asyncio.Queue):
+    """把一个角色的输出整体搬进队列，结束（含异常）时放入结束标记。"""
+    try:
+        async for item in agen:
+            queue.put_nowait(item)
+    finally:
+        queue.put_nowait(_STREAM_END)
+
+
 class DebateRequest(BaseModel):
     project_id: str
     topic: str
@@ -35,44 +68,57 @@ def _normalize_max_tokens(value, default_value: int) -> int:
     return max(256, min(12000, parsed))
 
 
-def _load_runtime_config(project_id: str) -> tuple[str, str, float, str, bool, int]:
-    with get_db() as db:
-        row = db.execute(
-            "SELECT p.model_main, p.model_secondary, ac.model AS cfg_model, "
-            "ac.temperature AS cfg_temp, ac.system_prompt AS cfg_prompt, ac.enabled AS cfg_enabled, "
-            "ac.max_tokens AS cfg_max_tokens "
-            "FROM projects p "
-            "LEFT JOIN agent_configs ac "
-            "ON ac.project_id = p.id AND ac.agent_type = ? "
-            "WHERE p.id = ?",
-            (AGENT_TYPE, project_id),
-        ).fetchone()
-        if not row:
-            return DEFAULT_MODEL, DEFAULT_MODEL, DEFAULT_TEMPERATURE, "", True, DEFAULT_MAX_TOKENS
-        cfg_model = str((row["cfg_model"] or "")).strip()
-        if cfg_model:
-            discuss_model = cfg_model
-            director_model = cfg_model
-        else:
-            discuss_model = str(row["model_main"] or DEFAULT_MODEL)
-            director_model = str(row["model_secondary"] or discuss_model)
-        cfg_temp = row["cfg_temp"]
-        temperature = float(cfg_temp) if cfg_temp is not None and float(cfg_temp) >= 0 else DEFAULT_TEMPERATURE
-        prompt_override = str((row["cfg_prompt"] or "")).strip()
-        enabled_raw = row["cfg_enabled"]
-        enabled = bool(enabled_raw) if enabled_raw is not None else True
-        max_tokens = _normalize_max_tokens(row["cfg_max_tokens"], DEFAULT_MAX_TOKENS)
-        return discuss_model, director_model, temperature, prompt_override, enabled, max_tokens
+_runtime_config_cache = TTLCache(maxsize=512, ttl=60.0)
+
+
+def _load_runtime_config(project_id: str, db=None) -> tuple[str, str, float, str, bool, int]:
+    cached = _runtime_config_cache.get(project_id)
+    if cached is not None:
+        return cached
+    if db is None:
+        with get_db() as db:
+            return _load_runtime_config(project_id, db)
+    row = db.execute(
+        "SELECT p.model_main, p.model_secondary, ac.model AS cfg_model, "
+        "ac.temperature AS cfg_temp, ac.system_prompt AS cfg_prompt, ac.enabled AS cfg_enabled, "
+        "ac.max_tokens AS cfg_max_tokens "
+        "FROM projects p "
+        "LEFT JOIN agent_configs ac "
+        "ON ac.project_id = p.id AND ac.agent_type = ? "
+        "WHERE p.id = ?",
+        (AGENT_TYPE, project_id),
+    ).fetchone()
+    if not row:
+        return DEFAULT_MODEL, DEFAULT_MODEL, DEFAULT_TEMPERATURE, "", True, DEFAULT_MAX_TOKENS
+    cfg_model = str((row["cfg_model"] or "")).strip()
+    if cfg_model:
+        discuss_model = cfg_model
+        director_model = cfg_model
+    else:
+        discuss_model = str(row["model_main"] or DEFAULT_MODEL)
+        director_model = str(row["model_secondary"] or discuss_model)
+    cfg_temp = row["cfg_temp"]
+    temperature = float(cfg_temp) if cfg_temp is not None and float(cfg_temp) >= 0 else DEFAULT_TEMPERATURE
+    prompt_override = str((row["cfg_prompt"] or "")).strip()
+    enabled_raw = row["cfg_enabled"]
+    enabled = bool(enabled_raw) if enabled_raw is not None else True
+    max_tokens = _normalize_max_tokens(row["cfg_max_tokens"], DEFAULT_MAX_TOKENS)
+    runtime = (discuss_model, director_model, temperature, prompt_override, enabled, max_tokens)
+    _runtime_config_cache.set(project_id, runtime)
+    return runtime
 
 async def debate_generator(project_id: str, topic: str):
     agent_router._init_services()
     llm = agent_router._llm
     if llm is None:
-        yield f"data: {json.dumps({'event': 'error', 'agent': 'system', 'text': '模型服务未初始化'})}\n\n"
+        yield _sse({'event': 'error', 'agent': 'system', 'text': '模型服务未初始化'})
         return
-    main_model, secondary_model, temperature, prompt_override, enabled, max_tokens = _load_runtime_config(project_id)
+    # 运行配置与角色数量共用一个连接
+    with get_db() as db:
+        main_model, secondary_model, temperature, prompt_override, enabled, max_tokens = _load_runtime_config(project_id, db)
+        cnt = db.execute("SELECT COUNT(*) as c FROM characters WHERE project_id = ?", (project_id,)).fetchone()
     if not enabled:
-        yield f"data: {json.dumps({'event': 'error', 'agent': 'system', 'text': '剧本围读已在项目设置中禁用'})}\n\n"
+        yield _sse({'event': 'error', 'agent': 'system', 'text': '剧本围读已在项目设置中禁用'})
         return
     role_max_tokens = max(200, min(6000, int(max_tokens * 0.5)))
     director_max_tokens = max(300, min(9000, max_tokens))
@@ -81,25 +127,15 @@ async def debate_generator(project_id: str, topic: str):
 
     # 1. 简要查一下项目背景上下文 (世界观与人物) 给 Prompt
     ctx = ""
-    with get_db() as db:
-        cnt = db.execute("SELECT COUNT(*) as c FROM characters WHERE project_id = ?", (project_id,)).fetchone()
-        if cnt and cnt["c"] > 0:
-            ctx += f"当前项目已有 {cnt['c']} 个角色设定。"
+    if cnt and cnt["c"] > 0:
+        ctx += f"当前项目已有 {cnt['c']} 个角色设定。"
 
     # Helper function to stream a specific agent's response
-    async def run_agent(agent_id, name, role_prompt, main_topic):
+    async def run_agent(agent_id, name, system_msg, main_topic):
+        token_prefix = _TOKEN_PREFIX[agent_id]
         # 1. 发送思考状态
-        yield f"data: {json.dumps({'event': 'agent_start', 'agent': agent_id, 'name': name})}\n\n"
-        await asyncio.sleep(0.5)
-
-        system_msg = (
-            f"{role_base_prompt}\n\n"
-            f"你当前扮演角色：【{name}】。\n"
-            f"{ctx}\n"
-            f"角色职责：{role_prompt}\n"
-            "输出要求：100-200字；先指出关键问题，再给可执行改法；不说套话。"
-        )
-        
+        yield "sse", _sse({'event': 'agent_start', 'agent': agent_id, 'name': name})
+
         try:
             full_reply = ""
             async for chunk in await llm.chat_stream(
@@ -114,76 +150,58 @@ async def debate_generator(project_id: str, topic: str):
                 if chunk:
                     full_reply += chunk
                     # Send token chunk
-                    yield f"data: {json.dumps({'event': 'token', 'agent': agent_id, 'text': chunk})}\n\n"
+                    yield "sse", token_prefix + orjson.dumps(chunk) + _TOKEN_SUFFIX
             
             # Agent finished
-            yield f"data: {json.dumps({'event': 'agent_done', 'agent': agent_id})}\n\n"
-            yield full_reply
+            yield "sse", _sse({'event': 'agent_done', 'agent': agent_id})
+            yield "final", full_reply
         except Exception as e:
-            yield f"data: {json.dumps({'event': 'error', 'agent': agent_id, 'text': str(e)})}\n\n"
-            yield ""
-
-    # Phase 1: 3 Agents parallel or sequential
-    # For a better visual effect in UI, we'll do it sequentially but we could do parallel.
-    # We will do sequential here to make it easier to read for the user, like a real chat.
-    
-    yield f"data: {json.dumps({'event': 'system', 'text': '剧本围读会议开始，各 Agent 就位...'})}\n\n"
-    await asyncio.sleep(1)
-
-    r1 = ""
-    async for chunk in run_agent(
-        "reader",
-        "挑剔的读者",
-        DEBATE_ROOM_ROLE_PROMPTS.get("reader", "聚焦读者体验、雷点与爽点。"),
-        topic,
-    ):
-        if isinstance(chunk, str) and chunk.startswith("data:"):
-            yield chunk
-        elif chunk and not chunk.startswith("data:"):
-            r1 = chunk # Capture final reply
-
-    await asyncio.sleep(1)
-            
-    r2 = ""
-    async for chunk in run_agent(
-        "villain",
-        "反派主脑",
-        DEBATE_ROOM_ROLE_PROMPTS.get("villain", "聚焦反派策略、压迫升级与代价。"),
-        topic,
-    ):
-        if isinstance(chunk, str) and chunk.startswith("data:"):
-            yield chunk
-        elif chunk and not chunk.startswith("data:"):
-            r2 = chunk
-
-    await asyncio.sleep(1)
-
-    r3 = ""
-    async for chunk in run_agent(
-        "architect",
-        "世界观架构师",
-        DEBATE_ROOM_ROLE_PROMPTS.get("architect", "聚焦设定一致性、规则边界与伏笔回收。"),
-        topic,
-    ):
-        if isinstance(chunk, str) and chunk.startswith("data:"):
-            yield chunk
-        elif chunk and not chunk.startswith("data:"):
-            r3 = chunk
-
-    await asyncio.sleep(1)
+            yield "sse", _sse({'event': 'error', 'agent': agent_id, 'text': str(e)})
+            yield "final", ""
+
+    # Phase 1: 三个角色同时向模型发起请求，各自的输出先进队列；
+    # 前端按“当前发言角色”拼接 token，所以仍按 读者→反派→架构师 的顺序依次转发，
+    # 后两位在前一位发言期间已在生成，轮到时直接吐出已缓冲的内容
+    yield _sse({'event': 'system', 'text': '剧本围读会议开始，各 Agent 就位...'})
+
+    # 三个角色的系统提示只差角色名与职责，公共的头尾各拼一次
+    role_head = f"{role_base_prompt}\n\n你当前扮演角色：【"
+    role_mid = f"】。\n{ctx}\n角色职责："
+    queues: list[asyncio.Queue] = []
+    tasks: list[asyncio.Task] = []
+    for agent_id, name, default_role_prompt in _DEBATE_ROLES:
+        role_prompt = DEBATE_ROOM_ROLE_PROMPTS.get(agent_id, default_role_prompt)
+        system_msg = f"{role_head}{name}{role_mid}{role_prompt}\n{_ROLE_OUTPUT_REQ}"
+        queue: asyncio.Queue = asyncio.Queue()
+        queues.append(queue)
+        tasks.append(asyncio.create_task(_pump_to_queue(
+            run_agent(agent_id, name, system_msg, topic),
+            queue,
+        )))
+
+    replies = ["", "", ""]
+    try:
+        for idx, queue in enumerate(queues):
+            while (item := await queue.get()) is not _STREAM_END:
+                kind, data = item
+                if kind == "sse":
+                    yield data
+                else:
+                    replies[idx] = data  # Capture final reply
+    finally:
+        # 客户端中途断开时取消仍在生成的角色
+        for task in tasks:
+            task.cancel()
+    r1, r2, r3 = replies
 
     # Phase 2: Director synthesizes
-    yield f"data: {json.dumps({'event': 'agent_start', 'agent': 'director', 'name': '主编导演'})}\n\n"
-    await asyncio.sleep(0.5)
+    yield _sse({'event': 'agent_start', 'agent': 'director', 'name': '主编导演'})
     
-    dir_sys = (
-        f"{director_base_prompt}\n\n"
-        f"{ctx}\n"
-        "请基于三位意见输出最终【剧情落地方案】。"
-    )
+    dir_sys = f"{director_base_prompt}\n\n{ctx}\n{_DIRECTOR_TASK}"
     dir_user = f"推演话题：{topic}\n\n读者意见：{r1}\n反派意见：{r2}\n架构师意见：{r3}"
 
     dir_reply = ""
+    director_prefix = _TOKEN_PREFIX["director"]
     try:
         async for chunk in await llm.chat_stream(
             model=secondary_model,
@@ -196,13 +214,13 @@ async def debate_generator(project_id: str, topic: str):
         ):
             if chunk:
                 dir_reply += chunk
-                yield f"data: {json.dumps({'event': 'token', 'agent': 'director', 'text': chunk})}\n\n"
+                yield director_prefix + orjson.dumps(chunk) + _TOKEN_SUFFIX
         
-        yield f"data: {json.dumps({'event': 'agent_done', 'agent': 'director'})}\n\n"
+        yield _sse({'event': 'agent_done', 'agent': 'director'})
     except Exception as e:
-         yield f"data: {json.dumps({'event': 'error', 'agent': 'director', 'text': str(e)})}\n\n"
+         yield _sse({'event': 'error', 'agent': 'director', 'text': str(e)})
 
-    yield f"data: {json.dumps({'event': 'system', 'text': '围读会议结束'})}\n\n"
+    yield _sse({'event': 'system', 'text': '围读会议结束'})
 
 
 @router.post("/start")
@@ -2,9 +2,12 @@
 from __future__ import annotations
 
 import re
+from functools import cache, lru_cache
+from itertools import combinations
 from pathlib import Path
 from typing import Any
 
+import ahocorasick
 from fastapi import APIRouter, HTTPException
 
 from db import get_db
@@ -13,15 +16,26 @@ router = APIRouter()
 
 
 def _clip(text: str, limit: int) -> str:
-    value = str(text or "").replace("\r\n", "\n").replace("\n", " ").strip()
-    if len(value) <= limit:
-        return value
-    return value[:limit] + "..."
+    value = str(text or "")
+    # 大多数描述没有换行，先判断再替换，省掉两次整串复制
+    if "\n" in value:
+        value = value.replace("\r\n", " ").replace("\n", " ")
+    value = value.strip()
+    return value if len(value) <= limit else value[:limit] + "..."
 
 
+def _pair(a: str, b: str) -> tuple[str, str]:
+    """无序角色对的规范键，等价于 tuple(sorted((a, b)))。"""
+    return (a, b) if a <= b else (b, a)
+
+
+# 删除全部 Unicode 空白（与正则 \s 的字符集一致，最大码位为全角空格 U+3000）
+_WHITESPACE_DELETE = dict.fromkeys(i for i in range(0x3001) if chr(i).isspace())
+
+
+@lru_cache(maxsize=8192)
 def _normalize_relation_type(text: str) -> str:
-    value = str(text or "").strip().lower()
-    return re.sub(r"\s+", "", value)
+    return str(text or "").translate(_WHITESPACE_DELETE).lower()
 
 
 _RELATION_NOISE_TYPES = {
@@ -373,15 +387,65 @@ _KEYWORD_RELATION_RULES: list[tuple[str, str, int, tuple[str, ...]]] = [
 ]
 
 
-def _contains_any(source_norm: str, keywords: tuple[str, ...] | list[str]) -> bool:
-    return any(_normalize_relation_type(key) in source_norm for key in keywords if key)
+def _normalize_keywords(keywords: tuple[str, ...]) -> tuple[str, ...]:
+    return tuple(_normalize_relation_type(key) for key in keywords if key)
+
+
+# 以下关键词在导入时归一化一次，热路径上只剩子串判断
+_DIRECTED_HINT_NORM = _normalize_keywords(_DIRECTED_HINT_WORDS)
+_BIDIRECTIONAL_HINT_NORM = _normalize_keywords(_BIDIRECTIONAL_HINT_WORDS)
+_DIRECTED_SECTION_NORM = _normalize_keywords(
+    ("血缘亲属", "婚姻姻亲", "收养与干亲", "校园师承", "职场商业", "社会服务关系", "身份与公共关系", "剧情与特殊关系", "网络与虚拟关系", "文化地域特色关系")
+)
+_BREAKUP_SIGNAL_NORM = _normalize_keywords(
+    (
+        "分手",
+        "已分手",
+        "前任",
+        "前男友",
+        "前女友",
+        "前夫",
+        "前妻",
+        "曾为情侣",
+        "曾经恋人",
+        "旧情",
+        "昔日恋人",
+        "感情破裂",
+    )
+)
+_ROMANCE_SIGNAL_NORM = _normalize_keywords(
+    (
+        "恋人",
+        "情侣",
+        "男友",
+        "女友",
+        "情人",
+        "伴侣",
+        "婚外情",
+        "暧昧",
+        "相亲对象",
+        "订婚对象",
+        "相爱",
+        "感情",
+        "旧情",
+        "复合",
+    )
+)
+_STRANGER_HINT_NORM = _normalize_keywords(("陌生", "点头之交", "不熟", "偶遇", "萍水相逢"))
+_SUPERFICIAL_HINT_NORM = _normalize_keywords(("表面和谐", "表面友好", "客套", "貌合神离", "逢场作戏"))
+_KIN_HINT_NORM = _normalize_keywords(("亲属", "家人", "亲戚", "血缘"))
+
+
+def _contains_any(source_norm: str, keywords_norm: tuple[str, ...]) -> bool:
+    """keywords_norm 须是已归一化的关键词（见 _normalize_keywords）。"""
+    return any(key in source_norm for key in keywords_norm)
 
 
 def _guess_relation_direction(label: str, section: str = "") -> str:
     text_norm = _normalize_relation_type(label)
     section_norm = _normalize_relation_type(section)
-    has_directed_hint = _contains_any(text_norm, _DIRECTED_HINT_WORDS)
-    has_bidir_hint = _contains_any(text_norm, _BIDIRECTIONAL_HINT_WORDS)
+    has_directed_hint = _contains_any(text_norm, _DIRECTED_HINT_NORM)
+    has_bidir_hint = _contains_any(text_norm, _BIDIRECTIONAL_HINT_NORM)
 
     if has_directed_hint and not has_bidir_hint:
         return "directed"
@@ -390,18 +454,28 @@ def _guess_relation_direction(label: str, section: str = "") -> str:
     if has_directed_hint and has_bidir_hint:
         return "directed"
 
-    if _contains_any(section_norm, ("朋友社交",)):
+    if "朋友社交" in section_norm:
         return "bidirectional"
-    if _contains_any(section_norm, ("情感婚恋",)):
+    if "情感婚恋" in section_norm:
         return "bidirectional"
-    if _contains_any(section_norm, ("血缘亲属", "婚姻姻亲", "收养与干亲", "校园师承", "职场商业", "社会服务关系", "身份与公共关系", "剧情与特殊关系", "网络与虚拟关系", "文化地域特色关系")):
+    if _contains_any(section_norm, _DIRECTED_SECTION_NORM):
         return "directed"
 
-    if _contains_any(text_norm, ("与", "和")):
+    if "与" in text_norm or "和" in text_norm:
         return "directed"
     return "unknown"
 
 
+# 一遍扫描全文：`## 分类` 标题行或 `N. 关系` 条目行；行首尾空白忽略，匹配不跨行。
+# 行边界与 str.splitlines 一致（read_text 已把 \r、\r\n 统一成 \n）。
+_LINE_BREAKS = "\n\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+_REFERENCE_LINE_RE = re.compile(
+    rf"(?:^|(?<=[{_LINE_BREAKS}]))[^\S{_LINE_BREAKS}]*"
+    rf"(?:## ([^{_LINE_BREAKS}]+?)|\d+\.[^\S{_LINE_BREAKS}]*([^{_LINE_BREAKS}]+?))"
+    rf"[^\S{_LINE_BREAKS}]*(?=[{_LINE_BREAKS}]|\Z)"
+)
+
+
 def _load_reference_relation_rules() -> list[tuple[str, str, str, int]]:
     candidates = [
         Path(__file__).resolve().parents[2] / "参考" / "人物关系大全500种.txt.md",
@@ -415,21 +489,21 @@ def _load_reference_relation_rules() -> list[tuple[str, str, str, int]]:
         content = ref_path.read_text(encoding="utf-8")
     except Exception:
         return []
+    return _parse_reference_relation_rules(content)
 
+
+def _parse_reference_relation_rules(content: str) -> list[tuple[str, str, str, int]]:
     section = ""
     seen: set[str] = set()
     rules: list[tuple[str, str, str, int]] = []
-    for line in content.splitlines():
-        stripped = line.strip()
-        if not stripped:
-            continue
-        if stripped.startswith("## "):
-            section = stripped[3:].strip()
-            continue
-        m = re.match(r"^\d+\.\s*(.+?)\s*$", stripped)
-        if not m:
+    for m in _REFERENCE_LINE_RE.finditer(content):
+        title, label = m.group(1), m.group(2)
+        if title is not None:
+            title = title.strip()
+            if title:
+                section = title
             continue
-        label = str(m.group(1) or "").strip()
+        label = label.strip()
         if not label:
             continue
         label_norm = _normalize_relation_type(label)
@@ -444,18 +518,31 @@ def _load_reference_relation_rules() -> list[tuple[str, str, str, int]]:
     return rules
 
 
-_REFERENCE_RELATION_RULES = _load_reference_relation_rules()
-_REFERENCE_RELATION_MAP = {item[0]: (item[1], item[2], item[3]) for item in _REFERENCE_RELATION_RULES}
+# 参考词典在首次分类时才读取解析，import 本模块（CLI、脚本、其他路由）不再付出解析成本。
+@cache
+def _reference_relation_rules() -> tuple[tuple[str, str, str, int], ...]:
+    return tuple(_load_reference_relation_rules())
+
+
+@cache
+def _reference_relation_map() -> dict[str, tuple[str, str, int]]:
+    return {item[0]: (item[1], item[2], item[3]) for item in _reference_relation_rules()}
 
 
-def _build_text_relation_keywords() -> tuple[str, ...]:
+@cache
+def _reference_rule_automaton() -> ahocorasick.Automaton | None:
+    return _build_priority_automaton([item[0] for item in _reference_relation_rules()])
+
+
+@cache
+def _text_relation_keywords() -> tuple[str, ...]:
     words: set[str] = set()
     for _, _, _, keys in _KEYWORD_RELATION_RULES:
         for key in keys:
             token = str(key or "").strip()
             if 1 <= len(token) <= 10:
                 words.add(token)
-    for _, label, _, _ in _REFERENCE_RELATION_RULES:
+    for _, label, _, _ in _reference_relation_rules():
         token = str(label or "").strip()
         if 1 <= len(token) <= 10:
             words.add(token)
@@ -466,77 +553,116 @@ def _build_text_relation_keywords() -> tuple[str, ...]:
     return tuple(sorted(words, key=len, reverse=True))
 
 
-_TEXT_RELATION_KEYWORDS = _build_text_relation_keywords()
+def _build_priority_automaton(keywords: list[str] | tuple[str, ...]) -> ahocorasick.Automaton | None:
+    """按优先级排列的关键词建成 Aho-Corasick 自动机，值为该词首次出现的序号。"""
+    ranks: dict[str, int] = {}
+    for rank, key in enumerate(keywords):
+        if key and key not in ranks:
+            ranks[key] = rank
+    if not ranks:
+        return None
+    automaton = ahocorasick.Automaton()
+    for key, rank in ranks.items():
+        automaton.add_word(key, rank)
+    automaton.make_automaton()
+    return automaton
+
+
+def _first_priority_hit(automaton: ahocorasick.Automaton | None, text: str) -> int:
+    """单遍扫描文本，返回命中关键词中最小的优先级序号；无命中返回 -1。"""
+    best = -1
+    if automaton is None or not text:
+        return best
+    for _, rank in automaton.iter(text):
+        if best < 0 or rank < best:
+            best = rank
+            if best == 0:
+                break
+    return best
+
+
+def _build_keyword_rule_automaton() -> ahocorasick.Automaton | None:
+    automaton = ahocorasick.Automaton()
+    for idx, (_, _, _, keys) in enumerate(_KEYWORD_RELATION_RULES):
+        for key in keys:
+            key_norm = _normalize_relation_type(key)
+            # 同一关键词出现在多条规则里时以靠前的规则为准
+            if key_norm and key_norm not in automaton:
+                automaton.add_word(key_norm, idx)
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_RULE_AUTOMATON = _build_keyword_rule_automaton()
+
+
+@cache
+def _text_relation_automaton() -> ahocorasick.Automaton | None:
+    return _build_priority_automaton(_text_relation_keywords())
 
 
 def _match_keyword_rule(text_norm: str) -> tuple[str, str, int] | None:
-    for label, direction, quality, keywords in _KEYWORD_RELATION_RULES:
-        if _contains_any(text_norm, keywords):
-            return label, direction, quality
-    return None
+    idx = _first_priority_hit(_KEYWORD_RULE_AUTOMATON, text_norm)
+    if idx < 0:
+        return None
+    label, direction, quality, _ = _KEYWORD_RELATION_RULES[idx]
+    return label, direction, quality
 
 
 def _match_reference_rule(text_norm: str) -> tuple[str, str, int] | None:
-    for label_norm, label, direction, quality in _REFERENCE_RELATION_RULES:
-        if label_norm in text_norm:
-            return label, direction, quality
-    return None
+    idx = _first_priority_hit(_reference_rule_automaton(), text_norm)
+    if idx < 0:
+        return None
+    _, label, direction, quality = _reference_relation_rules()[idx]
+    return label, direction, quality
 
 
-def _classify_relation_label(raw_type: str, description: str) -> tuple[str, str, int]:
+_ROMANCE_EXACT_LABELS = frozenset({"恋人", "男友", "女友", "伴侣", "情侣"})
+_PAST_ROMANCE = ("昔日恋人", "bidirectional", 5)
+
+
+def _build_keyword_exact_hits() -> dict[str, tuple[str, str, int]]:
+    """内置关键词单独作为关系类型时的分类结果（分手语义判定 + 规则优先级），导入时算好。"""
+    hits: dict[str, tuple[str, str, int]] = {}
+    for _, _, _, keys in _KEYWORD_RELATION_RULES:
+        for key in keys:
+            key_norm = _normalize_relation_type(key)
+            if not key_norm or key_norm in hits:
+                continue
+            if _contains_any(key_norm, _BREAKUP_SIGNAL_NORM) and _contains_any(key_norm, _ROMANCE_SIGNAL_NORM):
+                hits[key_norm] = _PAST_ROMANCE
+                continue
+            hit = _match_keyword_rule(key_norm)
+            if hit is not None:
+                hits[key_norm] = hit
+    return hits
+
+
+_KEYWORD_EXACT_HITS = _build_keyword_exact_hits()
+
+
+def _classify_relation_label_uncached(raw_type: str, description: str) -> tuple[str, str, int]:
     raw = str(raw_type or "").strip()
     desc = str(description or "").strip()
-    text_norm = _normalize_relation_type(f"{raw} {desc}")
     raw_norm = _normalize_relation_type(raw)
-
-    has_breakup_signal = _contains_any(
-        text_norm,
-        (
-            "分手",
-            "已分手",
-            "前任",
-            "前男友",
-            "前女友",
-            "前夫",
-            "前妻",
-            "曾为情侣",
-            "曾经恋人",
-            "旧情",
-            "昔日恋人",
-            "感情破裂",
-        ),
-    )
-    has_romance_signal = _contains_any(
-        text_norm,
-        (
-            "恋人",
-            "情侣",
-            "男友",
-            "女友",
-            "情人",
-            "伴侣",
-            "婚外情",
-            "暧昧",
-            "相亲对象",
-            "订婚对象",
-            "相爱",
-            "感情",
-            "旧情",
-            "复合",
-        ),
-    )
+    text_norm = _normalize_relation_type(f"{raw} {desc}") if desc else raw_norm
 
     # 若用户明确录入了500关系词典中的具体关系，优先按原标签输出。
-    exact = _REFERENCE_RELATION_MAP.get(raw_norm)
+    exact = _reference_relation_map().get(raw_norm)
     if exact is not None:
-        exact_label = str(exact[0] or "")
-        if has_breakup_signal and exact_label in {"恋人", "男友", "女友", "伴侣", "情侣"}:
-            return "昔日恋人", "bidirectional", 5
+        if exact[0] in _ROMANCE_EXACT_LABELS and _contains_any(text_norm, _BREAKUP_SIGNAL_NORM):
+            return _PAST_ROMANCE
         return exact
 
+    # 没有描述、关系类型恰为内置关键词时，结果只取决于该词本身，直接查表。
+    if not desc:
+        hit = _KEYWORD_EXACT_HITS.get(raw_norm)
+        if hit is not None:
+            return hit
+
     # 分手/前任语义优先于“恋人”。
-    if has_breakup_signal and has_romance_signal:
-        return "昔日恋人", "bidirectional", 5
+    if _contains_any(text_norm, _BREAKUP_SIGNAL_NORM) and _contains_any(text_norm, _ROMANCE_SIGNAL_NORM):
+        return _PAST_ROMANCE
 
     # 先看实际文本语义（关系类型 + 描述），再用500常见关系词典补全。
     hit = _match_keyword_rule(text_norm)
@@ -547,11 +673,11 @@ def _classify_relation_label(raw_type: str, description: str) -> tuple[str, str,
     if ref_hit is not None:
         return ref_hit
 
-    if _contains_any(text_norm, ("陌生", "点头之交", "不熟", "偶遇", "萍水相逢")):
+    if _contains_any(text_norm, _STRANGER_HINT_NORM):
         return "陌生", "bidirectional", 2
-    if _contains_any(text_norm, ("表面和谐", "表面友好", "客套", "貌合神离", "逢场作戏")):
+    if _contains_any(text_norm, _SUPERFICIAL_HINT_NORM):
         return "貌合神离", "bidirectional", 3
-    if _contains_any(text_norm, ("亲属", "家人", "亲戚", "血缘")):
+    if _contains_any(text_norm, _KIN_HINT_NORM):
         return "亲属（待细分）", "bidirectional", 1
 
     # 兜底：保留用户自定义关系，不把非常见关系强行覆盖。
@@ -562,6 +688,16 @@ def _classify_relation_label(raw_type: str, description: str) -> tuple[str, str,
     return "其他关联", "unknown", 0
 
 
+# 关系行与身份推断中的关系词大量重复，按 (关系类型, 描述) 记忆化；
+# 正文段落推断以整段文字为描述、几乎不会重复，直接调用未缓存版本。
+@lru_cache(maxsize=4096)
+def _classify_relation_label(raw_type: str, description: str) -> tuple[str, str, int]:
+    return _classify_relation_label_uncached(raw_type, description)
+
+
+_IDENTITY_RELATION_WORD_RE = re.compile(r"[^，。；、\s]{1,14}")
+
+
 def _infer_identity_relation(identity_text: str, target_name: str) -> tuple[str, str, str] | None:
     source = str(identity_text or "")
     target = str(target_name or "").strip()
@@ -569,11 +705,19 @@ def _infer_identity_relation(identity_text: str, target_name: str) -> tuple[str,
         return None
 
     # 严格模板：`某某的XXX`，再交由关系分类器判定。
-    m = re.search(rf"{re.escape(target)}的([^，。；、\s]{{1,14}})", source)
+    # 用 str.find 定位 `某某的`，只对其后的关系词用预编译正则，避免每对角色编译一次。
+    needle = f"{target}的"
+    m = None
+    pos = source.find(needle)
+    while pos >= 0:
+        m = _IDENTITY_RELATION_WORD_RE.match(source, pos + len(needle))
+        if m:
+            break
+        pos = source.find(needle, pos + 1)
     if not m:
         return None
 
-    rel = str(m.group(1) or "").strip()
+    rel = m.group(0).strip()
     if not rel:
         return None
 
@@ -585,6 +729,21 @@ def _infer_identity_relation(identity_text: str, target_name: str) -> tuple[str,
     return relation_type, direction, rel
 
 
+# 同一对角色会在大量段落里反复匹配，按人名对缓存编译好的模板，避免每段重新拼接与编译。
+@lru_cache(maxsize=2048)
+def _directed_relation_pattern(src: str, dst: str) -> re.Pattern[str]:
+    return re.compile(
+        rf"{re.escape(src)}[^。！？；\n]{{0,18}}(?:是|为|算是|作为)?{re.escape(dst)}的([^，。！？；、\s]{{1,12}})"
+    )
+
+
+@lru_cache(maxsize=2048)
+def _pair_relation_pattern(a: str, b: str) -> re.Pattern[str]:
+    return re.compile(
+        rf"{re.escape(a)}[^。！？；\n]{{0,8}}(?:与|和|跟){re.escape(b)}[^。！？；\n]{{0,12}}(?:是|为)?([^，。！？；、\s]{{1,12}})"
+    )
+
+
 def _infer_content_relation_between_names(
     paragraph: str,
     name_a: str,
@@ -599,45 +758,41 @@ def _infer_content_relation_between_names(
         return None
 
     # 方向明确：A是B的XX / B是A的XX
-    pattern_a_to_b = re.search(
-        rf"{re.escape(a)}[^。！？；\n]{{0,18}}(?:是|为|算是|作为)?{re.escape(b)}的([^，。！？；、\s]{{1,12}})",
-        text,
-    )
+    pattern_a_to_b = _directed_relation_pattern(a, b).search(text)
     if pattern_a_to_b:
         rel_word = str(pattern_a_to_b.group(1) or "").strip()
-        rel_type, rel_dir, quality = _classify_relation_label(rel_word, text)
+        rel_type, rel_dir, quality = _classify_relation_label_uncached(rel_word, text)
         if quality >= 3:
             direction = "directed" if rel_dir == "unknown" else rel_dir
             return rel_type, direction, quality, rel_word, a, b
 
-    pattern_b_to_a = re.search(
-        rf"{re.escape(b)}[^。！？；\n]{{0,18}}(?:是|为|算是|作为)?{re.escape(a)}的([^，。！？；、\s]{{1,12}})",
-        text,
-    )
+    pattern_b_to_a = _directed_relation_pattern(b, a).search(text)
     if pattern_b_to_a:
         rel_word = str(pattern_b_to_a.group(1) or "").strip()
-        rel_type, rel_dir, quality = _classify_relation_label(rel_word, text)
+        rel_type, rel_dir, quality = _classify_relation_label_uncached(rel_word, text)
         if quality >= 3:
             direction = "directed" if rel_dir == "unknown" else rel_dir
             return rel_type, direction, quality, rel_word, b, a
 
     # 对称关系：A和B是同学/搭档/盟友...
-    pair_pattern = re.search(
-        rf"{re.escape(a)}[^。！？；\n]{{0,8}}(?:与|和|跟){re.escape(b)}[^。！？；\n]{{0,12}}(?:是|为)?([^，。！？；、\s]{{1,12}})",
-        text,
-    )
+    pair_pattern = _pair_relation_pattern(a, b).search(text)
     if pair_pattern:
         rel_word = str(pair_pattern.group(1) or "").strip()
-        rel_type, rel_dir, quality = _classify_relation_label(rel_word, text)
+        rel_type, rel_dir, quality = _classify_relation_label_uncached(rel_word, text)
         if quality >= 3 and rel_dir == "bidirectional":
             return rel_type, "bidirectional", quality, rel_word, a, b
 
     # 兜底：若段落同时提到两人且出现明确双向关系词，允许推断。
-    for rel_word in _TEXT_RELATION_KEYWORDS:
-        if rel_word and rel_word in text:
-            rel_type, rel_dir, quality = _classify_relation_label(rel_word, text)
-            if quality >= 4 and rel_dir == "bidirectional":
-                return rel_type, "bidirectional", quality, rel_word, a, b
+    # 自动机一遍找出段落里出现的全部关系词，再按原有优先级依次判定。
+    text_automaton = _text_relation_automaton()
+    if text_automaton is None:
+        return None
+    keywords = _text_relation_keywords()
+    for idx in sorted({rank for _, rank in text_automaton.iter(text)}):
+        rel_word = keywords[idx]
+        rel_type, rel_dir, quality = _classify_relation_label_uncached(rel_word, text)
+        if quality >= 4 and rel_dir == "bidirectional":
+            return rel_type, "bidirectional", quality, rel_word, a, b
 
     return None
 
@@ -737,18 +892,22 @@ def get_relation_graph(
                     "quality": int(quality),
                 }
             )
-            explicit_pair_keys.add(tuple(sorted((source, target))))
+            explicit_pair_keys.add(_pair(source, target))
 
         reciprocal_keys: set[tuple[str, str, str]] = set()
         for item in relation_rows:
             reciprocal_keys.add((item["source"], item["target"], item["disp_type_norm"]))
 
         explicit_edge_map: dict[tuple[str, str, str], dict[str, Any]] = {}
+        # 合并时顺带记下“已有明确关系（质量 >= 3）”的角色对，供下面去弱标签使用
+        strong_pairs: set[tuple[str, str]] = set()
         for item in relation_rows:
             source = item["source"]
             target = item["target"]
-            pair_sorted = tuple(sorted((source, target)))
+            pair_sorted = _pair(source, target)
             edge_key = (pair_sorted[0], pair_sorted[1], item["disp_type_norm"])
+            if item["quality"] >= 3:
+                strong_pairs.add(pair_sorted)
 
             direction = "directed"
             if item["hint_direction"] == "bidirectional":
@@ -775,7 +934,7 @@ def get_relation_graph(
 
             existing = explicit_edge_map[edge_key]
             # 取更高质量的标签与更具体的描述。
-            if item["quality"] > int(existing.get("quality", 0)):
+            if item["quality"] > existing["quality"]:
                 existing["type"] = item["disp_type"]
                 existing["raw_type"] = item["raw_type"]
                 existing["quality"] = item["quality"]
@@ -784,25 +943,13 @@ def get_relation_graph(
             if direction == "bidirectional":
                 existing["direction"] = "bidirectional"
 
-        edges: list[dict[str, Any]] = list(explicit_edge_map.values())
-
         # 同一对角色若已有明确关系，去掉“其他关联”这种弱标签，减少噪声。
-        grouped_by_pair: dict[tuple[str, str], list[dict[str, Any]]] = {}
-        for edge in edges:
-            pair = tuple(sorted((str(edge["source"]), str(edge["target"]))))
-            grouped_by_pair.setdefault(pair, []).append(edge)
-
-        cleaned_edges: list[dict[str, Any]] = []
-        for pair_edges in grouped_by_pair.values():
-            has_strong = any(int(e.get("quality", 0)) >= 3 for e in pair_edges)
-            for edge in pair_edges:
-                quality = int(edge.get("quality", 0))
-                if quality <= 0:
-                    continue
-                if has_strong and str(edge.get("type", "")) in _WEAK_RELATION_LABELS:
-                    continue
-                cleaned_edges.append(edge)
-        edges = cleaned_edges
+        edges: list[dict[str, Any]] = [
+            edge
+            for edge_key, edge in explicit_edge_map.items()
+            if edge["quality"] > 0
+            and not (edge["type"] in _WEAK_RELATION_LABELS and edge_key[:2] in strong_pairs)
+        ]
 
         # 基于角色身份文本补充“可解释的推断关系”，解决例如“某角色是X的父亲”但未建关系边的场景。
         inferred_dedupe: set[tuple[str, str, str]] = set()
@@ -827,7 +974,7 @@ def get_relation_graph(
                     continue
                 if target_name not in identity:
                     continue
-                pair_key = tuple(sorted((owner_id, target_id)))
+                pair_key = _pair(owner_id, target_id)
                 if pair_key in explicit_pair_keys:
                     continue
 
@@ -868,99 +1015,106 @@ def get_relation_graph(
             rel_norm = _normalize_relation_type(str(edge.get("type") or ""))
             if not source_id or not target_id or not rel_norm:
                 continue
-            pair_sorted = tuple(sorted((source_id, target_id)))
+            pair_sorted = _pair(source_id, target_id)
             existing_edge_dedupe.add((pair_sorted[0], pair_sorted[1], rel_norm))
 
-        para_limit = max(240, min(2000, len(char_rows) * 20))
-        para_rows = db.execute(
-            "SELECT ch.id AS chapter_id, ch.chapter_num, ch.title AS chapter_title, cp.para_index, cp.content "
-            "FROM chapter_paragraphs cp "
-            "JOIN chapters ch ON ch.id = cp.chapter_id "
-            "WHERE ch.project_id = ? "
-            "ORDER BY ch.chapter_num ASC, cp.para_index ASC "
-            "LIMIT ?",
-            (pid, para_limit),
-        ).fetchall()
+        # 角色名建成自动机，每段一遍扫描即可得到出场角色；同名角色共用一个词条。
+        name_slots: dict[str, list[int]] = {}
+        for idx, (_, cname) in enumerate(names):
+            name_slots.setdefault(cname, []).append(idx)
+        name_automaton: ahocorasick.Automaton | None = None
+        if len(names) >= 2:
+            name_automaton = ahocorasick.Automaton()
+            for cname, slots in name_slots.items():
+                name_automaton.add_word(cname, tuple(slots))
+            name_automaton.make_automaton()
+
+        para_rows: list[Any] = []
+        if name_automaton is not None:
+            para_limit = max(240, min(2000, len(char_rows) * 20))
+            para_rows = db.execute(
+                "SELECT ch.id AS chapter_id, ch.chapter_num, ch.title AS chapter_title, cp.para_index, cp.content "
+                "FROM chapter_paragraphs cp "
+                "JOIN chapters ch ON ch.id = cp.chapter_id "
+                "WHERE ch.project_id = ? "
+                "ORDER BY ch.chapter_num ASC, cp.para_index ASC "
+                "LIMIT ?",
+                (pid, para_limit),
+            ).fetchall()
 
         for para in para_rows:
             text = str(para["content"] or "").strip()
             if len(text) < 6:
                 continue
-            mentioned: list[tuple[str, str]] = []
-            for cid, cname in names:
-                if cname in text:
-                    mentioned.append((cid, cname))
-                    if len(mentioned) >= 8:
-                        break
-            if len(mentioned) < 2:
+            # 沿用原有顺序（名字长度降序），每段最多取 8 个角色
+            hit_slots = sorted({slot for _, slots in name_automaton.iter(text) for slot in slots})
+            if len(hit_slots) < 2:
                 continue
+            mentioned = [names[slot] for slot in hit_slots[:8]]
 
-            for idx in range(len(mentioned) - 1):
-                for jdx in range(idx + 1, len(mentioned)):
-                    a_id, a_name = mentioned[idx]
-                    b_id, b_name = mentioned[jdx]
-                    pair_key = tuple(sorted((a_id, b_id)))
-                    if pair_key in explicit_pair_keys:
-                        continue
-                    inferred = _infer_content_relation_between_names(text, a_name, b_name)
-                    if not inferred:
-                        continue
-
-                    relation_type, direction, quality, rel_word, src_name, tgt_name = inferred
-                    if src_name == a_name and tgt_name == b_name:
-                        source_id = a_id
-                        target_id = b_id
-                    elif src_name == b_name and tgt_name == a_name:
-                        source_id = b_id
-                        target_id = a_id
-                    else:
-                        continue
-
-                    type_norm = _normalize_relation_type(relation_type)
-                    chapter_num = int(para["chapter_num"] or 0)
-                    if chapter_num > 0:
-                        rel_key = (pair_key[0], pair_key[1], type_norm)
-                        content_relation_chapters.setdefault(rel_key, set()).add(chapter_num)
-                        pair_chapters = content_pair_chapter_types.setdefault(pair_key, {})
-                        pair_chapters.setdefault(chapter_num, set()).add(relation_type)
-                    dedupe_key = (pair_key[0], pair_key[1], type_norm)
-                    if dedupe_key in existing_edge_dedupe:
-                        continue
-                    existing_edge_dedupe.add(dedupe_key)
-
-                    chapter_title = str(para["chapter_title"] or "").strip()
-                    para_index = int(para["para_index"] or 0)
-                    edge_id = (
-                        f"text:{str(para['chapter_id'])}:{para_index}:"
-                        f"{source_id}:{target_id}:{_normalize_relation_type(rel_word)}"
-                    )
-                    edges.append(
-                        {
-                            "id": edge_id,
-                            "source": source_id,
-                            "target": target_id,
-                            "type": relation_type,
-                            "raw_type": rel_word,
-                            "description": _clip(
-                                f"正文推断：第{chapter_num}章《{chapter_title or '未命名'}》段落出现“{rel_word}”语义。",
-                                180,
-                            ),
-                            "source_label": src_name,
-                            "target_label": tgt_name,
-                            "direction": direction,
-                            "relation_source": "content_inferred",
-                            "quality": int(quality),
-                            "chapter_nums": [chapter_num] if chapter_num > 0 else [],
-                            "evidence": [
-                                {
-                                    "chapter_id": str(para["chapter_id"]),
-                                    "chapter_num": chapter_num,
-                                    "chapter_title": chapter_title,
-                                    "snippet": _clip(text, 180),
-                                }
-                            ],
-                        }
-                    )
+            for (a_id, a_name), (b_id, b_name) in combinations(mentioned, 2):
+                pair_key = _pair(a_id, b_id)
+                if pair_key in explicit_pair_keys:
+                    continue
+                inferred = _infer_content_relation_between_names(text, a_name, b_name)
+                if not inferred:
+                    continue
+
+                relation_type, direction, quality, rel_word, src_name, tgt_name = inferred
+                if src_name == a_name and tgt_name == b_name:
+                    source_id = a_id
+                    target_id = b_id
+                elif src_name == b_name and tgt_name == a_name:
+                    source_id = b_id
+                    target_id = a_id
+                else:
+                    continue
+
+                type_norm = _normalize_relation_type(relation_type)
+                chapter_num = int(para["chapter_num"] or 0)
+                if chapter_num > 0:
+                    rel_key = (pair_key[0], pair_key[1], type_norm)
+                    content_relation_chapters.setdefault(rel_key, set()).add(chapter_num)
+                    pair_chapters = content_pair_chapter_types.setdefault(pair_key, {})
+                    pair_chapters.setdefault(chapter_num, set()).add(relation_type)
+                dedupe_key = (pair_key[0], pair_key[1], type_norm)
+                if dedupe_key in existing_edge_dedupe:
+                    continue
+                existing_edge_dedupe.add(dedupe_key)
+
+                chapter_title = str(para["chapter_title"] or "").strip()
+                para_index = int(para["para_index"] or 0)
+                edge_id = (
+                    f"text:{str(para['chapter_id'])}:{para_index}:"
+                    f"{source_id}:{target_id}:{_normalize_relation_type(rel_word)}"
+                )
+                edges.append(
+                    {
+                        "id": edge_id,
+                        "source": source_id,
+                        "target": target_id,
+                        "type": relation_type,
+                        "raw_type": rel_word,
+                        "description": _clip(
+                            f"正文推断：第{chapter_num}章《{chapter_title or '未命名'}》段落出现“{rel_word}”语义。",
+                            180,
+                        ),
+                        "source_label": src_name,
+                        "target_label": tgt_name,
+                        "direction": direction,
+                        "relation_source": "content_inferred",
+                        "quality": int(quality),
+                        "chapter_nums": [chapter_num] if chapter_num > 0 else [],
+                        "evidence": [
+                            {
+                                "chapter_id": str(para["chapter_id"]),
+                                "chapter_num": chapter_num,
+                                "chapter_title": chapter_title,
+                                "snippet": _clip(text, 180),
+                            }
+                        ],
+                    }
+                )
 
         # 统一为最终输出补证据（只在需要时查库）
         if include_evidence and safe_evidence_limit > 0:
@@ -998,7 +1152,7 @@ def get_relation_graph(
             nb = str(name_b or "").strip()
             if not na or not nb:
                 return []
-            key = tuple(sorted((na, nb)))
+            key = _pair(na, nb)
             if key in pair_mention_cache:
                 return pair_mention_cache[key]
             rows = db.execute(
@@ -1031,7 +1185,7 @@ def get_relation_graph(
                 source_id = str(edge.get("source") or "").strip()
                 target_id = str(edge.get("target") or "").strip()
                 rel_norm = _normalize_relation_type(str(edge.get("type") or ""))
-                rel_key = (*tuple(sorted((source_id, target_id))), rel_norm)
+                rel_key = (*_pair(source_id, target_id), rel_norm)
                 rel_specific_nums = sorted(content_relation_chapters.get(rel_key, set()))
                 if rel_specific_nums:
                     chapter_nums = rel_specific_nums
@@ -1062,7 +1216,7 @@ def get_relation_graph(
         for edge in edges:
             source_id = str(edge.get("source") or "").strip()
             target_id = str(edge.get("target") or "").strip()
-            pair_key = tuple(sorted((source_id, target_id)))
+            pair_key = _pair(source_id, target_id)
             edge["change_chapter_nums"] = list(pair_change_chapters.get(pair_key, []))
 
         if mode == "chapter" and selected_chapter_num > 0:
@@ -1086,8 +1240,7 @@ def get_relation_graph(
                 _bump_degree(source_id, target_id)
 
         for edge in edges:
-            if "quality" in edge:
-                edge.pop("quality", None)
+            edge.pop("quality", None)
 
         node_id_filter: set[str] | None = None
         if mode == "chapter":
@@ -11,6 +11,7 @@ from pydantic import BaseModel
 
 from db import get_db
 from agents import router as agent_router
+from api._runtime_cache import invalidate_project
 
 router = APIRouter()
 
@@ -1550,7 +1551,8 @@ def update_project(project_id: str, req: ProjectUpdate):
         row = db.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
         if not row:
             raise HTTPException(404, "项目不存在")
-        return dict(row)
+    invalidate_project(project_id)
+    return dict(row)
 
 
 @router.delete("/{project_id}")
@@ -1566,4 +1568,5 @@ def delete_project(project_id: str):
 
     with get_db() as db:
         db.execute("DELETE FROM projects WHERE id = ?", (project_id,))
-        return {"ok": True}
+    invalidate_project(project_id)
+    return {"ok": True}
@@ -4,6 +4,7 @@ from pydantic import BaseModel
 from typing import Optional
 from db import get_db
 from agents import router as agent_router
+from api._runtime_cache import invalidate_project
 from agents import prompts
 from agents.default_prompts import (
     WRITER_ASSISTANT_CHAT_SYSTEM_PROMPT,
@@ -348,7 +349,8 @@ def upsert_agent_config(req: AgentConfigUpsert):
             (req.project_id, req.agent_type, req.model, req.temperature,
              req.system_prompt, req.max_tokens, 1 if req.enabled else 0),
         )
-        return {"ok": True}
+    invalidate_project(req.project_id)
+    return {"ok": True}
 
 
 # ========== 自定义中转站 ==========
@@ -5,6 +5,8 @@ import sqlite3
 from contextlib import contextmanager
 
 _db_path: str | None = None
+# journal_mode=WAL 持久化在数据库文件上，每个路径只需设置一次
+_wal_ready_paths: set[str] = set()
 
 
 def get_data_dir() -> str:
@@ -45,12 +47,28 @@ def set_db_path(path: str):
     _db_path = path
 
 
+def _configure_connection(db: sqlite3.Connection, path: str):
+    """连接级 PRAGMA：WAL + synchronous=NORMAL，减少每次提交的 fsync。"""
+    db.execute("PRAGMA foreign_keys = ON")
+    if path not in _wal_ready_paths:
+        try:
+            db.execute("PRAGMA journal_mode = WAL")
+            _wal_ready_paths.add(path)
+        except sqlite3.OperationalError:
+            # 只读介质或被其他连接锁住时保持默认日志模式
+            pass
+    db.execute("PRAGMA synchronous = NORMAL")
+    db.execute("PRAGMA temp_store = MEMORY")
+    db.execute("PRAGMA mmap_size = 268435456")
+
+
 @contextmanager
 def get_db_with_path(db_path: str | None = None):
     """获取数据库连接 (context manager)，可指定数据库路径。"""
-    db = sqlite3.connect(db_path or get_db_path())
+    path = db_path or get_db_path()
+    db = sqlite3.connect(path)
     db.row_factory = sqlite3.Row
-    db.execute("PRAGMA foreign_keys = ON")
+    _configure_connection(db, path)
     try:
         yield db
         db.commit()
@@ -0,0 +1,127 @@
+"""AI trace regression: the Aho-Corasick literal scan matches the per-regex scan it replaced.
+
+Checks:
+1) hand-picked texts (overlapping literals, repeated hits, cased literals) give the baseline hits
+2) a seeded randomized corpus built from the pattern vocabulary gives the baseline hits
+   for every strictness and several hit limits
+
+All texts stay far below AI_TRACE_LOW_SCAN_LIMIT, whose low-strictness truncation is intentional.
+"""
+from __future__ import annotations
+
+import random
+import re
+from typing import Any
+
+from api.content import AI_TRACE_PATTERNS, _build_evidence_snippet, _detect_ai_trace_hits
+
+SEED = 20261016
+RANDOM_CASES = 3000
+STRICTNESS = ("low", "medium", "high")
+MAX_HITS = (1, 5, 24, 80)
+
+FIXTURES = [
+    "值得一提的是，值得一提的是，总的来说这很重要。",
+    "可能或许似乎某种程度上在一定程度上可能",
+    "命运的齿轮开始转动，时代的洪流裹挟着历史的车轮。",
+    "当然！希望这对你有帮助，如果你希望我继续，请告诉我。",
+    "格局生态赋能闭环多维协同沉浸式持续进化系统性全方位",
+    "尽管天色已晚，但是他仍然出发了。虽然很累，但他没有停。",
+    "Hope this helps. 当然!您说得完全正确",
+    "平静的一天，什么也没有发生。",
+    # 同一交替组内重叠的字面量：finditer 只取最左的一个；正文要够长，两段证据片段才会不同
+    "具有重要意义深远" + "城门外的夜色一点点沉下来" * 4,
+]
+
+
+def _baseline_hits(text: str, strictness: str, max_hits: int) -> list[dict[str, Any]]:
+    """改写前的实现：每个模式逐条 re.finditer。"""
+    source = str(text or "")
+    if not source.strip():
+        return []
+    safe_limit = max(1, min(80, int(max_hits or 24)))
+    min_conf = 0.26
+    if strictness == "low":
+        min_conf = 0.34
+    elif strictness == "high":
+        min_conf = 0.18
+
+    hits: list[dict[str, Any]] = []
+    seen_signatures: set[str] = set()
+    for pattern in AI_TRACE_PATTERNS:
+        pattern_hits = 0
+        for regex in pattern["regexes"]:
+            try:
+                iterator = re.finditer(regex, source, re.IGNORECASE)
+            except re.error:
+                continue
+            for matched in iterator:
+                evidence = _build_evidence_snippet(source, matched.start(), matched.end())
+                signature = f"{pattern['id']}::{evidence}"
+                if signature in seen_signatures:
+                    continue
+                seen_signatures.add(signature)
+                matched_text = str(matched.group(0) or "").strip()
+                confidence = 0.32 + min(0.35, len(matched_text) / 90) + min(0.2, pattern_hits * 0.08)
+                confidence = max(0.0, min(0.99, confidence))
+                if confidence < min_conf:
+                    continue
+                hits.append(
+                    {
+                        "pattern_id": pattern["id"],
+                        "pattern_name": pattern["name"],
+                        "evidence": evidence,
+                        "confidence": confidence,
+                        "advice": pattern["advice"],
+                        "weight": float(pattern["weight"]),
+                        "start": int(matched.start()),
+                        "end": int(matched.end()),
+                    }
+                )
+                pattern_hits += 1
+                if pattern_hits >= 2 or len(hits) >= safe_limit:
+                    break
+            if pattern_hits >= 2 or len(hits) >= safe_limit:
+                break
+        if len(hits) >= safe_limit:
+            break
+    hits.sort(key=lambda item: (float(item.get("weight", 0.0)), float(item.get("confidence", 0.0))), reverse=True)
+    return hits[:safe_limit]
+
+
+def _vocabulary() -> list[str]:
+    words: set[str] = set()
+    for pattern in AI_TRACE_PATTERNS:
+        for regex in pattern["regexes"]:
+            words.update(re.findall(r"[一-鿿]+|[A-Za-z]+", regex))
+    return sorted(words) + ["，", "。", "；", "、", "\n", "！", "!", " ", "他", "夜色", "城门", "Hope"]
+
+
+def _compare(text: str, strictness: str, max_hits: int) -> None:
+    expected = _baseline_hits(text, strictness, max_hits)
+    actual = _detect_ai_trace_hits(text, strictness, max_hits)
+    if actual != expected:
+        raise SystemExit(
+            f"[FAIL] {text!r} strictness={strictness} max_hits={max_hits}: "
+            f"expected {len(expected)} hits, got {len(actual)}"
+        )
+
+
+def main():
+    for text in FIXTURES:
+        for strictness in STRICTNESS:
+            for max_hits in MAX_HITS:
+                _compare(text, strictness, max_hits)
+
+    rng = random.Random(SEED)
+    vocabulary = _vocabulary()
+    for _ in range(RANDOM_CASES):
+        text = "".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 80)))
+        _compare(text, rng.choice(STRICTNESS), rng.choice(MAX_HITS))
+
+    print("[PASS] AI trace literal scan matches per-regex finditer")
+    print(f"[INFO] fixtures={len(FIXTURES)} random_cases={RANDOM_CASES} seed={SEED}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Entity candidate regression: existing-name dedup keeps str.strip().lower() semantics.
+
+Checks (on a scratch DB built from schema.sql + migrations):
+1) existing names padded with non-space whitespace (full-width space, tab, U+2009) still block candidates
+2) non-ASCII case variants (Élise / élise, ÄRGER / ärger) still block candidates
+3) names that only differ beyond case/whitespace are still inserted
+4) the ASCII/CJK probe is served by the migration 018 expression index
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+import uuid
+
+import db as db_module
+from api.content import _ENTITY_EXISTING_SQL, _persist_entity_candidates
+from migrate_db import run_migrations
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "database", "schema.sql")
+
+EXISTING_CHARACTERS = ["李四　", "王五\t", "Élise", " Abc ", "赵六\u2009"]
+EXISTING_WORLD_TITLES = ["天魔宗 ", "ÄRGER\n"]
+
+# (entity_type, candidate name, expected to be skipped as an existing entity)
+CASES = [
+    ("character", "李四", True),
+    ("character", "王五", True),
+    ("character", "élise", True),
+    ("character", "ÉLISE", True),
+    ("character", "abc", True),
+    ("character", "赵六", True),
+    ("character", "elise", False),
+    ("character", "李四四", False),
+    ("worldbuilding", "天魔宗", True),
+    ("worldbuilding", "ärger", True),
+    ("worldbuilding", "arger", False),
+]
+
+
+def _baseline_skipped(entity_type: str, name: str) -> bool:
+    existing = EXISTING_CHARACTERS if entity_type == "character" else EXISTING_WORLD_TITLES
+    return name.lower() in {label.strip().lower() for label in existing}
+
+
+def main():
+    data_dir = tempfile.mkdtemp(prefix="entity_existing_")
+    db_path = os.path.join(data_dir, "sanhuoai.db")
+    db_module.set_db_path(db_path)
+    db_module.init_db(SCHEMA_PATH)
+    run_migrations(db_path)
+
+    project_id = uuid.uuid4().hex
+    with db_module.get_db() as db:
+        db.execute("INSERT INTO projects (id, name, genre) VALUES (?, ?, ?)", (project_id, "Existing Names Regression", "测试"))
+        for name in EXISTING_CHARACTERS:
+            db.execute("INSERT INTO characters (project_id, name) VALUES (?, ?)", (project_id, name))
+        for title in EXISTING_WORLD_TITLES:
+            db.execute(
+                "INSERT INTO worldbuilding (project_id, category, title, content) VALUES (?, ?, ?, ?)",
+                (project_id, "势力", title, ""),
+            )
+        for entity_type, sql in _ENTITY_EXISTING_SQL.items():
+            plan = " ".join(str(r[-1]) for r in db.execute(f"EXPLAIN QUERY PLAN {sql}", (project_id, "李四")))
+            if "USING INDEX" not in plan:
+                raise SystemExit(f"[FAIL] {entity_type} probe does not use an index: {plan}")
+
+    for entity_type, name, expected in CASES:
+        if _baseline_skipped(entity_type, name) != expected:
+            raise SystemExit(f"[FAIL] fixture disagrees with baseline semantics: {entity_type} {name!r}")
+        result = _persist_entity_candidates(
+            project_id=project_id,
+            chapter_id=None,
+            items=[{"entity_type": entity_type, "name": name, "description": "回归测试候选"}],
+        )
+        skipped = result["inserted"] == 0
+        if skipped != expected:
+            raise SystemExit(f"[FAIL] {entity_type} {name!r}: expected skipped={expected}, got {result}")
+
+    print("[PASS] existing-name dedup matches str.strip().lower() and stays index-backed")
+    print(f"[INFO] cases={len(CASES)}")
+    print(f"[INFO] db_path={db_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Entity extraction regression: cancelling the first caller must not cancel followers.
+
+Checks:
+1) a follower joining an in-flight extraction still gets the result after the leader is cancelled
+2) the shared extraction runs exactly once
+3) the in-flight slot is released once the shared run finishes
+"""
+from __future__ import annotations
+
+import asyncio
+
+from api import content
+
+
+class FakeRun:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, *, project_id, chapter_id, text, limit, strict):
+        _ = (project_id, chapter_id, text, limit, strict)
+        self.calls += 1
+        await asyncio.sleep(0.2)
+        return {"inserted": 1, "skipped": 0, "archived": 0, "items": []}
+
+
+async def main():
+    fake_run = FakeRun()
+    content._run_extract_and_store_entity_candidates = fake_run
+    kwargs = dict(project_id="regression", chapter_id="ch1", text="正文", limit=8, strict=True)
+
+    leader = asyncio.create_task(content._extract_and_store_entity_candidates(**kwargs))
+    await asyncio.sleep(0.05)
+    follower = asyncio.create_task(content._extract_and_store_entity_candidates(**kwargs))
+    await asyncio.sleep(0.05)
+    leader.cancel()
+
+    try:
+        await leader
+    except asyncio.CancelledError:
+        pass
+    else:
+        raise SystemExit("[FAIL] expected leader to be cancelled")
+
+    try:
+        result = await follower
+    except asyncio.CancelledError:
+        raise SystemExit("[FAIL] follower was cancelled together with the leader")
+    if result.get("inserted") != 1:
+        raise SystemExit(f"[FAIL] unexpected follower result: {result}")
+
+    if fake_run.calls != 1:
+        raise SystemExit(f"[FAIL] expected 1 shared run, got {fake_run.calls}")
+    if content._entity_extract_inflight:
+        raise SystemExit("[FAIL] in-flight slot was not released")
+
+    print("[PASS] follower survives leader cancellation and shares a single run")
+    print(f"[INFO] runs={fake_run.calls}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+"""Graph regression: the single-pass reference relation parser matches the line-by-line parser it replaced.
+
+Checks:
+1) hand-picked files (odd line breaks, blank headers, indented and full-width-padded lines) give the baseline rules
+2) a seeded randomized corpus of reference files gives the baseline rules
+3) the bundled reference file, when present, gives the baseline rules
+"""
+from __future__ import annotations
+
+import random
+import re
+from pathlib import Path
+
+from api.graph import _guess_relation_direction, _normalize_relation_type, _parse_reference_relation_rules
+
+SEED = 20261016
+RANDOM_CASES = 5000
+REFERENCE_PATH = Path(__file__).resolve().parents[2] / "参考" / "人物关系大全500种.txt.md"
+
+FIXTURES = [
+    "## 家庭关系\n1. 父子\n2. 母女\n\n## 师门\n3. 师徒\n",
+    "##   \n1. 兄弟\n## \u3000\n2. 姐妹",
+    "  ## 朋友  \n\t10.  好友  \n11.\n12.\u3000\n",
+    "## 上下级\x0c1. 上司\x852. 下属\u20283. 同僚\u2029## 其他\x1c4. 路人",
+    "1.父子\n1. 父子\n1. 父 子\n",
+    "#3 不是标题\n### 三级标题\n1 没有点\n١. 阿拉伯数字\n",
+    "",
+]
+
+_BREAKS = ["\n", "\n", "\n", "\x0b", "\x0c", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029"]
+_PADDING = ["", "", " ", "  ", "\t", "\u3000", "\xa0", "\u2009"]
+_WORDS = ["父子", "母女", "师徒", "上司", "下属", "恋人", "夫妻", "仇敌", "兄弟", "姐妹", "主仆", "关系", "A", "b"]
+
+
+def _baseline_rules(content: str) -> list[tuple[str, str, str, int]]:
+    """改写前的实现：splitlines 后逐行 strip + re.match。"""
+    section = ""
+    seen: set[str] = set()
+    rules: list[tuple[str, str, str, int]] = []
+    for line in content.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.startswith("## "):
+            section = stripped[3:].strip()
+            continue
+        m = re.match(r"^\d+\.\s*(.+?)\s*$", stripped)
+        if not m:
+            continue
+        label = str(m.group(1) or "").strip()
+        if not label:
+            continue
+        label_norm = _normalize_relation_type(label)
+        if not label_norm or label_norm in seen:
+            continue
+        seen.add(label_norm)
+        direction = _guess_relation_direction(label, section)
+        quality = 5 if direction != "unknown" else 4
+        rules.append((label_norm, label, direction, quality))
+    rules.sort(key=lambda item: len(item[1]), reverse=True)
+    return rules
+
+
+def _random_line(rng: random.Random) -> str:
+    roll = rng.random()
+    body = rng.choice(_PADDING).join(rng.choice(_WORDS) for _ in range(rng.randint(0, 3)))
+    if roll < 0.2:
+        head = rng.choice(["## ", "##", "### ", "#"])
+    elif roll < 0.8:
+        head = f"{rng.randint(0, 600)}{rng.choice(['.', '.', '、', ''])}{rng.choice(_PADDING)}"
+    else:
+        head = ""
+    return f"{rng.choice(_PADDING)}{head}{body}{rng.choice(_PADDING)}"
+
+
+def _compare(content: str, label: str) -> None:
+    expected = _baseline_rules(content)
+    actual = _parse_reference_relation_rules(content)
+    if actual != expected:
+        raise SystemExit(f"[FAIL] {label} {content[:120]!r}: expected {len(expected)} rules, got {len(actual)}")
+
+
+def main():
+    for content in FIXTURES:
+        _compare(content, "fixture")
+
+    rng = random.Random(SEED)
+    for _ in range(RANDOM_CASES):
+        lines = [_random_line(rng) for _ in range(rng.randint(0, 12))]
+        content = "".join(line + rng.choice(_BREAKS) for line in lines)
+        if rng.random() < 0.5:
+            content = content[:-1]
+        _compare(content, "random case")
+
+    if REFERENCE_PATH.exists():
+        _compare(REFERENCE_PATH.read_text(encoding="utf-8"), "reference file")
+        print(f"[INFO] reference_file={REFERENCE_PATH}")
+    else:
+        print("[INFO] reference file not found, skipped")
+
+    print("[PASS] single-pass reference parser matches line-by-line parsing")
+    print(f"[INFO] fixtures={len(FIXTURES)} random_cases={RANDOM_CASES} seed={SEED}")
+
+
+if __name__ == "__main__":
+    main()
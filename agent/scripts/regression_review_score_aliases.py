@@ -0,0 +1,81 @@
+"""Review score regression: combined alias regex matches the per-alias search it replaced.
+
+Checks:
+1) hand-picked overlaps (suffix aliases, case variants, full-width colon) give the baseline scores
+2) a seeded randomized corpus gives the baseline scores for every dimension
+"""
+from __future__ import annotations
+
+import random
+import re
+
+from api.content import _REVIEW_SCORE_ALIASES, _extract_scores_from_text
+
+SEED = 20261016
+RANDOM_CASES = 20000
+
+FIXTURES = [
+    "角色一致性：7\n一致性：9",
+    "一致性：9\n角色一致性：7",
+    "主线一致性: 6 内容一致性：8",
+    "叙事节奏：5，推进节奏：7，节奏：3",
+    "因果逻辑：4 角色逻辑：6",
+    "CONSISTENCY: 80 Character：70 PaCiNg : 60 logic:50",
+    "人物塑造：1234 角色塑造：88",
+    "逻辑：七 逻辑：6",
+    "角色逻辑：\n 9",
+    "",
+]
+
+
+def _baseline_scores(raw_review: str) -> dict[str, int]:
+    """改写前的实现：每个维度按优先级逐个别名 search，取第一个命中。"""
+    scores: dict[str, int] = {}
+    for dim, aliases in _REVIEW_SCORE_ALIASES.items():
+        for alias in aliases:
+            match = re.search(rf"{re.escape(alias)}\s*[：:]\s*(\d{{1,3}})", raw_review, re.IGNORECASE)
+            if match:
+                scores[dim] = int(match.group(1))
+                break
+    return scores
+
+
+def _random_review(rng: random.Random) -> str:
+    aliases = [alias for words in _REVIEW_SCORE_ALIASES.values() for alias in words]
+    filler = ["，", "。", "\n", " ", "本章", "角色", "主线", "叙事", "推进", "因果", "评分", "分"]
+    parts: list[str] = []
+    for _ in range(rng.randint(1, 12)):
+        roll = rng.random()
+        if roll < 0.5:
+            alias = rng.choice(aliases)
+            parts.append(alias.upper() if rng.random() < 0.2 else alias)
+            parts.append(rng.choice(["", " ", "\n"]))
+            parts.append(rng.choice(["：", ":", "", "-"]))
+            parts.append(rng.choice(["", " ", "  "]))
+            parts.append(str(rng.randint(0, 1200)) if rng.random() < 0.9 else "十")
+        else:
+            parts.append(rng.choice(filler))
+    return "".join(parts)
+
+
+def main():
+    for text in FIXTURES:
+        expected = _baseline_scores(text)
+        actual = _extract_scores_from_text(text)
+        if actual != expected:
+            raise SystemExit(f"[FAIL] fixture {text!r}: expected {expected}, got {actual}")
+
+    rng = random.Random(SEED)
+    for _ in range(RANDOM_CASES):
+        text = _random_review(rng)
+        expected = _baseline_scores(text)
+        actual = _extract_scores_from_text(text)
+        if actual != expected:
+            raise SystemExit(f"[FAIL] random case {text!r}: expected {expected}, got {actual}")
+
+    print("[PASS] combined review score regex matches per-alias search")
+    print(f"[INFO] fixtures={len(FIXTURES)} random_cases={RANDOM_CASES} seed={SEED}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+-- 伏笔提取入库去重：按 (project_id, name) 定位，再比对章节锚点
+CREATE INDEX IF NOT EXISTS idx_foreshadowing_dedupe
+    ON foreshadowing(project_id, name, plant_chapter_id, resolve_chapter_id);
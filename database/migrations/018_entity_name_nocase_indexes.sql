@@ -0,0 +1,6 @@
+-- trim 的字符集与 str.strip() 相同（全部 Unicode 空白），须与 api/content.py 的 _SQL_TRIM_CHARS 逐字一致
+CREATE INDEX IF NOT EXISTS idx_characters_project_name_nocase
+    ON characters(project_id, trim(name, char(9, 10, 11, 12, 13, 28, 29, 30, 31, 32, 133, 160, 5760, 8192, 8193, 8194, 8195, 8196, 8197, 8198, 8199, 8200, 8201, 8202, 8232, 8233, 8239, 8287, 12288)) COLLATE NOCASE);
+
+CREATE INDEX IF NOT EXISTS idx_worldbuilding_project_title_nocase
+    ON worldbuilding(project_id, trim(title, char(9, 10, 11, 12, 13, 28, 29, 30, 31, 32, 133, 160, 5760, 8192, 8193, 8194, 8195, 8196, 8197, 8198, 8199, 8200, 8201, 8202, 8232, 8233, 8239, 8287, 12288)) COLLATE NOCASE);
@@ -0,0 +1,2 @@
+CREATE INDEX IF NOT EXISTS idx_entity_candidates_project_status_name
+    ON entity_candidates(project_id, status, entity_type, name);
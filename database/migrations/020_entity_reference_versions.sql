@@ -0,0 +1,35 @@
+-- 角色/世界观每次增删改都把项目版本号 +1，供抽取提示词里的“已有设定”缓存判断是否过期
+CREATE TABLE IF NOT EXISTS entity_reference_versions (
+    project_id  TEXT PRIMARY KEY,
+    version     INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS characters_refver_ai AFTER INSERT ON characters BEGIN
+    INSERT INTO entity_reference_versions (project_id, version) VALUES (new.project_id, 1)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS characters_refver_au AFTER UPDATE ON characters BEGIN
+    INSERT INTO entity_reference_versions (project_id, version) VALUES (new.project_id, 1)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS characters_refver_ad AFTER DELETE ON characters BEGIN
+    INSERT INTO entity_reference_versions (project_id, version) VALUES (old.project_id, 1)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS worldbuilding_refver_ai AFTER INSERT ON worldbuilding BEGIN
+    INSERT INTO entity_reference_versions (project_id, version) VALUES (new.project_id, 1)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS worldbuilding_refver_au AFTER UPDATE ON worldbuilding BEGIN
+    INSERT INTO entity_reference_versions (project_id, version) VALUES (new.project_id, 1)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS worldbuilding_refver_ad AFTER DELETE ON worldbuilding BEGIN
+    INSERT INTO entity_reference_versions (project_id, version) VALUES (old.project_id, 1)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS projects_refver_ad AFTER DELETE ON projects BEGIN
+    DELETE FROM entity_reference_versions WHERE project_id = old.id;
+END;
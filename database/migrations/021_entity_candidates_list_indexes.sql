@@ -0,0 +1,5 @@
+CREATE INDEX IF NOT EXISTS idx_entity_candidates_project_status_created
+    ON entity_candidates(project_id, status, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_entity_candidates_project_chapter_status
+    ON entity_candidates(project_id, chapter_id, status);
@@ -0,0 +1,8 @@
+-- 审阅记录按项目/章节筛选并按时间倒序读取：
+-- chapter_id = ? 与 chapter_id IS NULL（全书审阅）走第一个索引，
+-- 不限章节或 chapter_id IS NOT NULL 走第二个索引，均免去临时排序
+CREATE INDEX IF NOT EXISTS idx_reviews_project_chapter_created
+    ON reviews(project_id, chapter_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_reviews_project_created
+    ON reviews(project_id, created_at DESC);